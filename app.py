@@ -1,56 +1,52 @@
-from flask import Flask, request, jsonify, send_file, session
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_file, session
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ReplaceOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson.objectid import ObjectId
 from datetime import datetime, date, timedelta
 # Invoice Management System - Backend API
+import bisect
+import heapq
 import json
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
+import re
 import os
-import tempfile
 import random
 import secrets
 import hashlib
 from dotenv import load_dotenv
-import qrcode
 from io import BytesIO
 import base64
-import requests
+import csv
+import io
+import zlib
+import threading
+import time
+import socket
+import gridfs
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import click
+import codecs
+import copy
+from collections import OrderedDict
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(32))
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-
-# Environment detection for CORS settings
-is_production = os.getenv('FLASK_ENV') == 'production'
-if is_production:
-    app.config['SESSION_COOKIE_SAMESITE'] = 'None'
-    app.config['SESSION_COOKIE_SECURE'] = True
-else:
-    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-    app.config['SESSION_COOKIE_SECURE'] = False
+# Routes and CLI commands are registered on this blueprint; create_app() builds the app around it
+bp = Blueprint('invoice_system', __name__, cli_group=None)
 
 # CORS configuration - allow all origins for development and production
-CORS(app, 
-     supports_credentials=True,
-     origins=[
-         'https://kandhal-invoice-system.vercel.app',
-         'http://localhost:3000',
-         'http://127.0.0.1:3000',
-         'http://127.0.0.1:5000',
-         'http://localhost:5000',
-     ],
-     allow_headers=['Content-Type', 'Authorization'],
-     expose_headers=['Content-Type', 'Authorization'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+CORS_ORIGINS = [
+    'https://kandhal-invoice-system.vercel.app',
+    'http://localhost:3000',
+    'http://127.0.0.1:3000',
+    'http://127.0.0.1:5000',
+    'http://localhost:5000',
+]
 
 # Additional CORS handler to ensure headers are always present
-@app.after_request
 def after_request(response):
     origin = request.headers.get('Origin', '*')
     response.headers['Access-Control-Allow-Origin'] = origin if origin != '*' else 'https://kandhal-invoice-system.vercel.app'
@@ -61,7 +57,6 @@ def after_request(response):
     return response
 
 # Error handler to ensure CORS on errors too
-@app.errorhandler(Exception)
 def handle_error(error):
     response = jsonify({'error': str(error)})
     response.status_code = 500
@@ -72,6 +67,32 @@ def handle_error(error):
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     return response
 
+def create_app():
+    """Application factory. Opens no database connections; those are made per process on first use."""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', secrets.token_hex(32))
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    
+    # Environment detection for CORS settings
+    is_production = os.getenv('FLASK_ENV') == 'production'
+    if is_production:
+        app.config['SESSION_COOKIE_SAMESITE'] = 'None'
+        app.config['SESSION_COOKIE_SECURE'] = True
+    else:
+        app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+        app.config['SESSION_COOKIE_SECURE'] = False
+    
+    CORS(app, 
+         supports_credentials=True,
+         origins=CORS_ORIGINS,
+         allow_headers=['Content-Type', 'Authorization'],
+         expose_headers=['Content-Type', 'Authorization', 'X-Export-Watermark'],
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    app.after_request(after_request)
+    app.register_error_handler(Exception, handle_error)
+    app.register_blueprint(bp)
+    return app
+
 # MongoDB connection from environment variables
 connection_string = os.getenv('MONGODB_URI')
 database_name = os.getenv('MONGODB_DATABASE', 'grocery_shop')
@@ -79,16 +100,59 @@ database_name = os.getenv('MONGODB_DATABASE', 'grocery_shop')
 if not connection_string:
     raise ValueError("MONGODB_URI environment variable is not set in .env file")
 
-client = MongoClient(connection_string)
-db = client[database_name]
-items_collection = db.items
-invoices_collection = db.invoices
-auth_collection = db.auth_sessions
-customers_collection = db.customers
+class ProcessLocal:
+    """Proxy to an object created on first use in each process.
+    
+    MongoClient is not fork-safe, so a client made before gunicorn --preload
+    forks its workers (or before the PDF process pool forks) must not be
+    reused in the child. The proxy rebuilds its object whenever the PID changes.
+    """
+    
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._pid = None
+        self._value = None
+        if hasattr(os, 'register_at_fork'):
+            # A lock copied while held by another thread would never be released in the child
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def _after_fork(self):
+        self._lock = threading.Lock()
+    
+    def current(self):
+        """The object for this process, created if needed"""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+    
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+client = ProcessLocal(lambda: MongoClient(connection_string))
+db = ProcessLocal(lambda: client.current().get_database(database_name))
+items_collection = ProcessLocal(lambda: db.current().items)
+invoices_collection = ProcessLocal(lambda: db.current().invoices)
+auth_collection = ProcessLocal(lambda: db.current().auth_sessions)
+customers_collection = ProcessLocal(lambda: db.current().customers)
+counters_collection = ProcessLocal(lambda: db.current().counters)
+jobs_collection = ProcessLocal(lambda: db.current().jobs)
+migrations_collection = ProcessLocal(lambda: db.current().migrations)
+daily_sales_collection = ProcessLocal(lambda: db.current().daily_sales)
+customer_sales_collection = ProcessLocal(lambda: db.current().customer_sales)
+reorder_alerts_collection = ProcessLocal(lambda: db.current().reorder_alerts)
+job_results = ProcessLocal(lambda: gridfs.GridFS(db.current(), collection='job_results'))
+
+# Invoice numbering: 'global' keeps one sequence for all shops, 'shop' numbers each shop from 1
+INVOICE_ID_SCOPE = os.getenv('INVOICE_ID_SCOPE', 'global')
 
 # Global OPTIONS handler for all routes
-@app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
-@app.route('/<path:path>', methods=['OPTIONS'])
+@bp.route('/', defaults={'path': ''}, methods=['OPTIONS'])
+@bp.route('/<path:path>', methods=['OPTIONS'])
 def handle_options(path):
     response = jsonify({'status': 'ok'})
     origin = request.headers.get('Origin', '*')
@@ -99,37 +163,420 @@ def handle_options(path):
     response.headers['Access-Control-Max-Age'] = '3600'
     return response, 200
 
-# Create indexes for better performance
-items_collection.create_index("item_name")
-invoices_collection.create_index("invoice_id")
-invoices_collection.create_index("customer_name")
-auth_collection.create_index("email")
-auth_collection.create_index("expires_at", expireAfterSeconds=0)
-customers_collection.create_index("email")
-customers_collection.create_index("phone")
-customers_collection.create_index("user_email")
-
-# Migration: Only fix items with truly missing or N/A units
-print("Running database migration for units...")
-try:
-    # Only update items that explicitly have N/A or are completely missing unit field
-    result1 = items_collection.update_many(
+# Index set, one entry per query shape the endpoints run. Every per-shop query
+# filters on user_email first, so it leads the compound keys. Applied with
+# `flask --app app ensure-indexes`, never on import.
+INDEXES = {
+    auth_collection: [
+        IndexModel([("email", 1)], unique=True),                          # login, signup, password reset
+        IndexModel([("session_token", 1)], unique=True, sparse=True),     # require_auth, verify-session, logout
+    ],
+    items_collection: [
+        IndexModel([("user_email", 1), ("item_name", 1)]),                # add/import by name, QR label sheet order
+        IndexModel([("user_email", 1), ("name_lc", 1)]),                  # prefix/substring search, list items
+        IndexModel([("user_email", 1), ("item_name", "text")], name="item_name_text"),  # token search
+        IndexModel([("user_email", 1), ("created_at", 1)]),               # export date range
+        IndexModel([("user_email", 1), ("updated_at", 1)]),               # incremental export since
+        IndexModel([("user_email", 1), ("stock", 1)]),                    # low-stock reorder list
+    ],
+    invoices_collection: [
+        IndexModel([("user_email", 1), ("invoice_id", 1)], unique=True),  # invoice pages, lookup, PDFs
+        IndexModel([("user_email", 1), ("order_date", 1)]),               # stats, batch print and export date ranges
+        IndexModel([("user_email", 1), ("customer_email", 1)]),           # customer purchase totals
+        IndexModel([("user_email", 1), ("customer_phone_e164", 1)]),      # customer purchase totals
+        IndexModel([("user_email", 1), ("updated_at", 1)]),               # incremental export since
+    ],
+    customers_collection: [
+        IndexModel([("user_email", 1), ("created_at", -1)]),              # customer list, export date range
+        IndexModel([("user_email", 1), ("phone_e164", 1)], unique=True,
+                   partialFilterExpression={"phone_e164": {"$gt": ""}}),  # duplicate check, billing lookup, import, totals rollup
+        IndexModel([("user_email", 1), ("email_lc", 1)]),                 # billing lookup
+        IndexModel([("user_email", 1), ("customer_email", 1)]),           # totals rollup on new invoices
+        IndexModel([("user_email", 1), ("updated_at", 1)]),               # incremental export since
+    ],
+    jobs_collection: [
+        IndexModel([("status", 1), ("created_at", 1)]),                   # worker claims the oldest queued job
+        IndexModel([("user_email", 1), ("created_at", -1)]),              # job list
+        IndexModel([("expires_at", 1)]),                                  # expired result cleanup
+    ],
+    daily_sales_collection: [
+        IndexModel([("user_email", 1), ("day", -1)], unique=True),        # stats, rollup upserts
+    ],
+    customer_sales_collection: [
+        IndexModel([("user_email", 1), ("customer", 1)], unique=True),    # rollup upserts
+        IndexModel([("user_email", 1), ("total", -1)]),                   # stats top customers
+    ],
+    reorder_alerts_collection: [
+        IndexModel([("user_email", 1), ("acknowledged_at", 1), ("created_at", -1)]),  # open alerts
+        IndexModel([("user_email", 1), ("created_at", -1)]),              # alert history
+    ],
+}
+
+# Representative queries for each endpoint, explained by `flask --app app index-report`
+QUERY_SHAPES = [
+    (auth_collection, "login", {"email": "shop@example.com"}, None),
+    (auth_collection, "session check", {"session_token": "token"}, None),
+    (items_collection, "list items", {"user_email": "shop@example.com"}, None),
+    (items_collection, "add item by name", {"user_email": "shop@example.com", "item_name": "Milk"}, None),
+    (items_collection, "item search (prefix)", {"user_email": "shop@example.com", "name_lc": {"$regex": "^mi"}}, [("name_lc", 1)]),
+    (items_collection, "QR label sheet", {"user_email": "shop@example.com"}, [("item_name", 1)]),
+    (items_collection, "low-stock list", {"user_email": "shop@example.com", "stock": {"$lte": 5}}, [("stock", 1)]),
+    (invoices_collection, "invoice page", {"user_email": "shop@example.com", "invoice_id": {"$lt": 1000}}, [("invoice_id", -1)]),
+    (invoices_collection, "invoice by ID", {"user_email": "shop@example.com", "invoice_id": 1000}, None),
+    (invoices_collection, "invoices in date range", {"user_email": "shop@example.com", "order_date": {"$gte": datetime(2024, 1, 1)}}, None),
+    (invoices_collection, "customer totals", {"user_email": "shop@example.com", "$or": [
+        {"customer_email": {"$in": ["a@example.com"]}}, {"customer_phone_e164": {"$in": ["+919876543210"]}}
+    ]}, None),
+    (customers_collection, "customer list", {"user_email": "shop@example.com"}, [("created_at", -1)]),
+    (customers_collection, "duplicate phone check", {"user_email": "shop@example.com", "phone_e164": "+919876543210"}, None),
+    (customers_collection, "billing lookup (email)", {"user_email": "shop@example.com", "email_lc": {"$regex": "^a"}}, [("email_lc", 1)]),
+    (customers_collection, "totals rollup", {"user_email": "shop@example.com", "$or": [
+        {"customer_email": "a@example.com"}, {"phone_e164": "+919876543210"}
+    ]}, None),
+    (jobs_collection, "claim next job", {"status": "queued"}, [("created_at", 1)]),
+    (jobs_collection, "job list", {"user_email": "shop@example.com"}, [("created_at", -1)]),
+    (daily_sales_collection, "stats totals", {"user_email": "shop@example.com", "day": "all"}, None),
+    (customer_sales_collection, "stats top customers", {"user_email": "shop@example.com"}, [("total", -1)]),
+    (reorder_alerts_collection, "open reorder alerts", {"user_email": "shop@example.com", "acknowledged_at": None}, [("created_at", -1)]),
+    (daily_sales_collection, "stats recent days", {"user_email": "shop@example.com", "day": {"$ne": "all"}}, [("day", -1)]),
+    (daily_sales_collection, "item analytics window", {"user_email": "shop@example.com", "day": {"$gte": "2024-01-01", "$lte": "2024-01-31"}}, None),
+]
+
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+def index_plan(collection):
+    """Compare declared and existing indexes: (missing, changed, undeclared) index names"""
+    declared = {model.document['name']: model.document for model in INDEXES.get(collection, [])}
+    existing = collection.index_information()
+    missing = [name for name in declared if name not in existing]
+    changed = [
+        name for name in declared
+        if name in existing and any(declared[name].get(option) != existing[name].get(option) for option in INDEX_OPTIONS)
+    ]
+    undeclared = [name for name in existing if name != '_id_' and name not in declared]
+    return missing, changed, undeclared
+
+def ensure_indexes(drop=False, dry_run=False):
+    """Create missing declared indexes; with drop, also rebuild changed ones and remove undeclared ones.
+    
+    Returns a list of (collection, index, action) where action is 'created',
+    'rebuilt', 'dropped', 'undeclared' or 'failed: <reason>' (prefixed with
+    'would be' for a dry run).
+    """
+    actions = []
+    for collection, models in INDEXES.items():
+        by_name = {model.document['name']: model for model in models}
+        missing, changed, undeclared = index_plan(collection)
+        prefix = 'would be ' if dry_run else ''
+        for name in undeclared:
+            if drop and not dry_run:
+                collection.drop_index(name)
+            actions.append((collection.name, name, prefix + 'dropped' if drop else 'undeclared'))
+        for name in changed + missing:
+            action = 'created' if name in missing else 'rebuilt'
+            if name in changed and not drop:
+                actions.append((collection.name, name, 'differs (use --drop to rebuild)'))
+                continue
+            if not dry_run:
+                try:
+                    if name in changed:
+                        collection.drop_index(name)
+                    collection.create_indexes([by_name[name]])
+                except Exception as e:
+                    # e.g. a unique index over existing duplicates; the others still get built
+                    action = f'failed: {e}'
+            actions.append((collection.name, name, prefix + action if dry_run else action))
+    return actions
+
+def winning_plan_indexes(plan):
+    """Index names used by an explain() winning plan, with 'COLLSCAN' for collection scans"""
+    plan = plan.get('queryPlan', plan)
+    used = []
+    if plan.get('stage') == 'COLLSCAN':
+        used.append('COLLSCAN')
+    if plan.get('indexName'):
+        used.append(plan['indexName'])
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        if child:
+            used.extend(winning_plan_indexes(child))
+    return used
+
+def index_report():
+    """Usage counters from $indexStats plus the plan each known query shape gets"""
+    report = {"collections": {}, "queries": []}
+    for collection in INDEXES:
+        missing, changed, undeclared = index_plan(collection)
+        usage = {}
+        try:
+            for stats in collection.aggregate([{"$indexStats": {}}]):
+                usage[stats['name']] = {"ops": stats['accesses']['ops'], "since": stats['accesses']['since']}
+        except Exception as e:
+            print(f"$indexStats unavailable for {collection.name}: {e}")
+        report["collections"][collection.name] = {
+            "missing": missing,
+            "changed": changed,
+            "undeclared": undeclared,
+            "unused": sorted(name for name, stats in usage.items() if name != '_id_' and stats['ops'] == 0),
+            "usage": usage
+        }
+    for collection, label, query, sort in QUERY_SHAPES:
+        cursor = collection.find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+            used = winning_plan_indexes(plan)
+        except Exception as e:
+            used = [f'explain failed: {e}']
+        report["queries"].append({"collection": collection.name, "query": label, "indexes": used})
+    return report
+
+@bp.cli.command('ensure-indexes')
+@click.option('--drop', is_flag=True, help='Also rebuild changed indexes and drop undeclared ones')
+@click.option('--dry-run', is_flag=True, help='Only print what would change')
+def ensure_indexes_command(drop, dry_run):
+    """Build the declared index set (run on deploy, before starting the server)"""
+    actions = ensure_indexes(drop=drop, dry_run=dry_run)
+    for collection_name, name, action in actions:
+        print(f"{collection_name}.{name}: {action}")
+    if not actions:
+        print("Indexes are up to date")
+
+@bp.cli.command('index-report')
+def index_report_command():
+    """Show missing, undeclared and unused indexes and the plan each endpoint query gets"""
+    report = index_report()
+    for collection_name, info in report["collections"].items():
+        print(f"\n{collection_name}")
+        for name, stats in sorted(info["usage"].items()):
+            print(f"  {name:<40} {stats['ops']:>10} ops since {stats['since']:%Y-%m-%d %H:%M}")
+        for key in ("missing", "changed", "undeclared", "unused"):
+            if info[key]:
+                print(f"  {key}: {', '.join(info[key])}")
+    print("\nQuery plans")
+    for entry in report["queries"]:
+        flag = "  <-- collection scan" if 'COLLSCAN' in entry["indexes"] else ""
+        print(f"  {entry['collection']:<15} {entry['query']:<28} {', '.join(entry['indexes']) or '-'}{flag}")
+
+def normalize_item_name(item_name):
+    """Lowercase search key stored as items.name_lc for indexed prefix search"""
+    return ' '.join(str(item_name or '').split()).lower()
+
+def backfill_item_name_keys(batch_size=1000):
+    """Set name_lc on items that are missing it, returning how many were updated"""
+    updated = 0
+    batch = []
+    for item in items_collection.find({"name_lc": {"$exists": False}}, {"item_name": 1}):
+        batch.append(UpdateOne({"_id": item['_id']}, {"$set": {"name_lc": normalize_item_name(item.get('item_name'))}}))
+        if len(batch) >= batch_size:
+            updated += items_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += items_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '91')
+PHONE_MIN_DIGITS = 7  # Country code plus national number; shorter input is not a phone number
+
+def normalize_phone(phone):
+    """E.164 form of a phone number ("+919876543210"), or '' if it is not one.
+    
+    Numbers without an international prefix are taken as national numbers in
+    PHONE_DEFAULT_COUNTRY_CODE, with any leading trunk 0 dropped. Input with
+    no national digits left (e.g. "0000000000"), a country code starting
+    with 0 or fewer than PHONE_MIN_DIGITS digits in all gives ''.
+    """
+    phone = str(phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('+'):
+        e164 = digits
+    elif phone.startswith('00'):
+        e164 = digits[2:]
+    elif len(digits) > 10 and digits.startswith(PHONE_DEFAULT_COUNTRY_CODE) and not digits.startswith('0'):
+        e164 = digits
+    else:
+        national = digits.lstrip('0')
+        e164 = PHONE_DEFAULT_COUNTRY_CODE + national if national else ''
+    if len(e164) < PHONE_MIN_DIGITS or e164.startswith('0'):
+        return ''
+    return '+' + e164
+
+def normalize_email(email):
+    """Lowercase email stored as customers.email_lc"""
+    return str(email or '').strip().lower()
+
+def customer_lookup_keys(customer_phone, customer_email):
+    """Indexed lookup fields derived from a customer's phone and email"""
+    return {"phone_e164": normalize_phone(customer_phone), "email_lc": normalize_email(customer_email)}
+
+def backfill_customer_lookup_keys(batch_size=1000):
+    """Set phone_e164/email_lc on customers that are missing them, returning how many were updated"""
+    updated = 0
+    batch = []
+    for customer in customers_collection.find({"phone_e164": {"$exists": False}}, {"customer_phone": 1, "customer_email": 1}):
+        keys = customer_lookup_keys(customer.get('customer_phone'), customer.get('customer_email'))
+        batch.append(UpdateOne({"_id": customer['_id']}, {"$set": keys}))
+        if len(batch) >= batch_size:
+            updated += customers_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += customers_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+def backfill_invoice_phone_keys(batch_size=1000):
+    """Set customer_phone_e164 on invoices that are missing it, returning how many were updated"""
+    updated = 0
+    batch = []
+    for invoice in invoices_collection.find({"customer_phone_e164": {"$exists": False}}, {"customer_number": 1}):
+        phone_e164 = normalize_phone(invoice.get('customer_number'))
+        batch.append(UpdateOne({"_id": invoice['_id']}, {"$set": {"customer_phone_e164": phone_e164}}))
+        if len(batch) >= batch_size:
+            updated += invoices_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += invoices_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+# Data migrations: each runs once per database, in version order, via
+# `flask --app app migrate` on deploy. Worker startup never writes.
+MIGRATIONS = []
+MIGRATION_LOCK_MINUTES = 60
+
+def migration(version, description):
+    """Register a data migration; migrations must be safe to re-run if interrupted"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+@migration(1, "Default missing or N/A item units to pcs")
+def migrate_item_units():
+    result = items_collection.update_many(
         {"$or": [{"unit": "N/A"}, {"unit": None}, {"unit": ""}]},
         {"$set": {"unit": "pcs"}}
     )
+    return f"{result.modified_count} items updated"
+
+@migration(2, "Store customer purchase totals")
+def migrate_customer_totals():
+    return f"{rebuild_customer_totals()} customers updated"
+
+@migration(3, "Add item search keys (name_lc)")
+def migrate_item_name_keys():
+    return f"{backfill_item_name_keys()} items updated"
+
+@migration(4, "Add customer phone/email lookup keys")
+def migrate_customer_lookup_keys():
+    return f"{backfill_customer_lookup_keys()} customers updated"
+
+SALES_ROLLUP_MIGRATION = 5
+
+@migration(SALES_ROLLUP_MIGRATION, "Build daily sales rollups")
+def migrate_daily_sales():
+    return f"{rebuild_daily_sales()} rollups written"
+
+@migration(6, "Match customer totals on normalized phone numbers")
+def migrate_invoice_phone_keys():
+    invoices = backfill_invoice_phone_keys()
+    return f"{invoices} invoices updated, {rebuild_customer_totals()} customer totals rebuilt"
+
+@migration(7, "Remove empty stock reservation lists from items")
+def migrate_empty_stock_reservations():
+    result = items_collection.update_many(
+        {"stock_reservations": {"$size": 0}},
+        {"$unset": {"stock_reservations": ""}}
+    )
+    return f"{result.modified_count} items updated"
+
+@migration(8, "Clear phone keys of numbers without national digits")
+def migrate_invalid_phone_keys():
+    # Earlier normalization turned e.g. "0000000000" into a bare "+91"
+    short_key = {"$regex": "^\\+(0|\\d{0,%d}$)" % (PHONE_MIN_DIGITS - 1)}
+    customers = customers_collection.update_many({"phone_e164": short_key}, {"$set": {"phone_e164": ""}}).modified_count
+    invoices = invoices_collection.update_many({"customer_phone_e164": short_key}, {"$set": {"customer_phone_e164": ""}}).modified_count
+    rebuilt = rebuild_customer_totals() if customers or invoices else 0
+    return f"{customers} customers and {invoices} invoices updated, {rebuilt} customer totals rebuilt"
+
+def applied_migrations():
+    """Applied migration records keyed by version"""
+    return {record['_id']: record for record in migrations_collection.find({"_id": {"$ne": "lock"}})}
+
+def pending_migrations():
+    applied = applied_migrations()
+    return [entry for entry in MIGRATIONS if entry[0] not in applied]
+
+def acquire_migration_lock(owner):
+    """Take the migration lock, or a lock left behind by a run that died; False if another run holds it"""
+    now = datetime.now()
+    try:
+        migrations_collection.insert_one({"_id": "lock", "owner": owner, "locked_at": now})
+        return True
+    except DuplicateKeyError:
+        result = migrations_collection.update_one(
+            {"_id": "lock", "locked_at": {"$lt": now - timedelta(minutes=MIGRATION_LOCK_MINUTES)}},
+            {"$set": {"owner": owner, "locked_at": now}}
+        )
+        return result.modified_count == 1
+
+def run_migrations(target=None):
+    """Apply pending migrations up to target (all by default), recording each as it completes.
     
-    if result1.modified_count > 0:
-        print(f"Updated {result1.modified_count} items with problematic units")
-    else:
-        print("No items needed unit updates")
-except Exception as e:
-    print(f"Migration error: {e}")
+    Returns [(version, description, result)]. Raises RuntimeError when another
+    run holds the lock; a failing migration raises and leaves later ones pending.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    if not acquire_migration_lock(owner):
+        raise RuntimeError("Another migration run is in progress")
+    try:
+        applied = []
+        for version, description, func in pending_migrations():
+            if target is not None and version > target:
+                break
+            started = time.time()
+            result = func()
+            migrations_collection.insert_one({
+                "_id": version,
+                "description": description,
+                "result": result,
+                "applied_at": datetime.now(),
+                "duration_seconds": round(time.time() - started, 3),
+                "applied_by": owner
+            })
+            applied.append((version, description, result))
+        return applied
+    finally:
+        migrations_collection.delete_one({"_id": "lock", "owner": owner})
 
+@bp.cli.command('migrate')
+@click.option('--to', 'target', type=int, default=None, help='Stop after this migration version')
+@click.option('--skip-indexes', is_flag=True, help='Do not build missing indexes first')
+def migrate_command(target, skip_indexes):
+    """Build missing indexes, then apply pending data migrations (run once per deploy)"""
+    if not skip_indexes:
+        for collection_name, name, action in ensure_indexes():
+            print(f"{collection_name}.{name}: {action}")
+    try:
+        applied = run_migrations(target)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for version, description, result in applied:
+        print(f"Applied migration {version}: {description} ({result})")
+    if not applied:
+        print("No pending migrations")
 
+@bp.cli.command('migration-status')
+def migration_status_command():
+    """List migrations and when each was applied"""
+    applied = applied_migrations()
+    for version, description, _ in MIGRATIONS:
+        record = applied.get(version)
+        state = f"applied {record['applied_at']:%Y-%m-%d %H:%M} ({record.get('result')})" if record else "pending"
+        print(f"{version:>4}  {description:<45} {state}")
 
 # Health check endpoint
-@app.route('/health', methods=['GET', 'OPTIONS'])
-@app.route('/api/health', methods=['GET', 'OPTIONS'])
+@bp.route('/health', methods=['GET', 'OPTIONS'])
+@bp.route('/api/health', methods=['GET', 'OPTIONS'])
 def health_check():
     """Health check endpoint to wake up the server"""
     try:
@@ -139,6 +586,12 @@ def health_check():
             'status': 'ok',
             'message': 'Server is running',
             'database': 'connected',
+            'session_cache': session_cache.stats(),
+            'pdf_cache': pdf_cache.stats(),
+            'qr_cache': qr_cache.stats(),
+            'item_catalog': item_catalog.stats(),
+            'stats_cache': stats_cache.stats(),
+            'pending_migrations': [version for version, _, _ in pending_migrations()],
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -226,7 +679,7 @@ def generate_otp_html(otp, email_type='signup'):
     }
 
 # EmailJS Configuration Endpoint
-@app.route('/api/emailjs-config', methods=['GET', 'OPTIONS'])
+@bp.route('/api/emailjs-config', methods=['GET', 'OPTIONS'])
 def get_emailjs_config():
     """Provide EmailJS configuration to frontend - No authentication required"""
     return jsonify({
@@ -237,7 +690,7 @@ def get_emailjs_config():
     })
 
 # Authentication endpoints
-@app.route('/api/auth/send-signup-otp', methods=['POST'])
+@bp.route('/api/auth/send-signup-otp', methods=['POST'])
 def send_signup_otp():
     """Send OTP for email verification during signup"""
     try:
@@ -297,7 +750,7 @@ def send_signup_otp():
         print(f"Error sending signup OTP: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/verify-signup', methods=['POST'])
+@bp.route('/api/auth/verify-signup', methods=['POST'])
 def verify_signup():
     """Verify OTP and create account"""
     try:
@@ -354,7 +807,7 @@ def verify_signup():
         print(f"Error verifying signup: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/login', methods=['POST'])
+@bp.route('/api/auth/login', methods=['POST'])
 def login():
     """Login with email and password"""
     try:
@@ -395,6 +848,8 @@ def login():
                 }
             }
         )
+        # Previous token was overwritten, drop it from the cache
+        session_cache.invalidate_email(email)
         
         return jsonify({
             "success": True,
@@ -410,7 +865,7 @@ def login():
         print(f"Error during login: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/forgot-password', methods=['POST'])
+@bp.route('/api/auth/forgot-password', methods=['POST'])
 def forgot_password():
     """Send OTP for password reset"""
     try:
@@ -458,7 +913,7 @@ def forgot_password():
         print(f"Error sending reset OTP: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/reset-password', methods=['POST'])
+@bp.route('/api/auth/reset-password', methods=['POST'])
 def reset_password():
     """Reset password with OTP verification"""
     try:
@@ -499,6 +954,7 @@ def reset_password():
                 "$unset": {"reset_otp": "", "reset_otp_expires": ""}
             }
         )
+        session_cache.invalidate_email(email)
         
         return jsonify({
             "success": True,
@@ -509,7 +965,7 @@ def reset_password():
         print(f"Error resetting password: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/verify-session', methods=['POST'])
+@bp.route('/api/auth/verify-session', methods=['POST'])
 def verify_session():
     """Verify if session token is valid"""
     try:
@@ -544,7 +1000,7 @@ def verify_session():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/auth/logout', methods=['POST'])
+@bp.route('/api/auth/logout', methods=['POST'])
 def logout():
     """Logout user and invalidate session"""
     try:
@@ -556,18 +1012,104 @@ def logout():
                 {"session_token": session_token},
                 {"$unset": {"session_token": "", "session_expires": ""}}
             )
+            session_cache.invalidate(session_token)
         
         return jsonify({"success": True, "message": "Logged out successfully"})
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+class SessionCache:
+    """Bounded LRU cache of auth documents keyed by session token.
+    
+    Entries live for at most ``ttl_seconds`` and never beyond the session's own
+    ``session_expires``. The cache is per process, so the TTL also bounds how
+    long another gunicorn worker may keep honouring a token after logout.
+    """
+    
+    def __init__(self, max_size=1024, ttl_seconds=60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, token):
+        """Return the cached auth document for token, or None on a miss"""
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            auth_doc, cache_expires = entry
+            if cache_expires <= now:
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return auth_doc
+    
+    def set(self, token, auth_doc):
+        """Cache auth_doc until the TTL or the session expiry, whichever is first"""
+        if self.max_size <= 0:
+            return
+        cache_expires = datetime.now() + timedelta(seconds=self.ttl_seconds)
+        session_expires = auth_doc.get('session_expires')
+        if session_expires and session_expires < cache_expires:
+            cache_expires = session_expires
+        with self._lock:
+            self._entries[token] = (auth_doc, cache_expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, token):
+        """Drop a single session token"""
+        with self._lock:
+            self._entries.pop(token, None)
+    
+    def invalidate_email(self, email):
+        """Drop every cached session belonging to email"""
+        with self._lock:
+            stale = [token for token, (auth_doc, _) in self._entries.items()
+                     if auth_doc.get('email') == email]
+            for token in stale:
+                del self._entries[token]
+    
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+session_cache = SessionCache(
+    max_size=int(os.getenv('SESSION_CACHE_SIZE', 1024)),
+    ttl_seconds=int(os.getenv('SESSION_CACHE_TTL', 60))
+)
+
 # Security middleware to verify session token
 def verify_session_token(token):
     """Verify if session token is valid and not expired"""
     if not token:
         return None
     
+    auth_doc = session_cache.get(token)
+    if auth_doc:
+        return auth_doc
+    
     auth_doc = auth_collection.find_one({"session_token": token})
     
     if not auth_doc:
@@ -582,6 +1124,7 @@ def verify_session_token(token):
         )
         return None
     
+    session_cache.set(token, auth_doc)
     return auth_doc
 
 def require_auth(f):
@@ -603,6 +1146,7 @@ def require_auth(f):
         # Add user email to request context
         request.user_email = auth_doc['email']
         request.user_id = str(auth_doc['_id'])
+        request.auth_doc = auth_doc
         
         return f(*args, **kwargs)
     
@@ -630,8 +1174,136 @@ def serialize_doc(doc):
         return result
     return doc
 
-def generate_qr_code(data):
-    """Generate QR code and return as base64 string"""
+class BinaryCache:
+    """Size-bounded LRU cache of generated files (PDFs, PNGs) with an optional disk tier.
+    
+    Keys are content addresses of whatever was rendered, so a changed source
+    simply produces a new key; invalidate() only frees the stale entry early.
+    """
+    
+    DISK_PRUNE_INTERVAL = 100
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None, disk_max_files=10000, suffix=''):
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.disk_dir = disk_dir
+        self.disk_max_files = disk_max_files
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+    
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, data)
+        return data
+    
+    def set(self, key, data):
+        self._remember(key, data)
+        self._write_disk(key, data)
+    
+    def invalidate(self, key):
+        """Drop an entry from memory and disk"""
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+    
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}{self.suffix}")
+    
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Cache disk write failed: {e}")
+            return
+        
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self._prune_disk()
+    
+    def _prune_disk(self):
+        """Delete the least recently written files beyond disk_max_files"""
+        try:
+            entries = [entry for entry in os.scandir(self.disk_dir)
+                       if entry.name.endswith(self.suffix) and not entry.name.endswith('.tmp')]
+            if len(entries) <= self.disk_max_files:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.disk_max_files]:
+                os.remove(entry.path)
+        except OSError as e:
+            print(f"Cache disk prune failed: {e}")
+    
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_dir": self.disk_dir
+            }
+
+def generate_qr_png(data):
+    """Generate a QR code PNG for data"""
+    import qrcode  # Deferred with PIL to the first QR request to keep worker boot fast
+    
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -644,61 +1316,207 @@ def generate_qr_code(data):
     img = qr.make_image(fill_color="black", back_color="white")
     buffered = BytesIO()
     img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return img_str
+    return buffered.getvalue()
+
+def generate_qr_code(data):
+    """Generate QR code and return as base64 string"""
+    return base64.b64encode(generate_qr_png(data)).decode()
+
+qr_cache = BinaryCache(max_bytes=int(os.getenv('QR_CACHE_MB', 8)) * 1024 * 1024, suffix='.png')
+
+def item_qr_key(item):
+    """Return (payload, cache key) for an item's QR code; the key changes with name, price or unit"""
+    payload = json.dumps({
+        "item_id": str(item["_id"]),
+        "item_name": item["item_name"],
+        "item_price": item["item_price"],
+        "unit": item.get("unit", "pcs")
+    })
+    return payload, hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def item_qr_png(item):
+    """Return (cache key, PNG bytes) for an item's QR code, generating it on a cache miss"""
+    payload, key = item_qr_key(item)
+    png = qr_cache.get(key)
+    if png is None:
+        png = generate_qr_png(payload)
+        qr_cache.set(key, png)
+    return key, png
 
-@app.route('/api/items', methods=['GET'])
+# Item fields never sent to clients: stock_reservations is only set while an
+# invoice is mid-way through the compensating stock writes
+ITEM_PROJECTION = {"stock_reservations": 0}
+
+@bp.route('/api/items', methods=['GET'])
 @require_auth
 def get_items():
     """Get all items - Requires authentication"""
     try:
         user_email = request.user_email
-        items = list(items_collection.find({"user_email": user_email}))
+        items = list(items_collection.find({"user_email": user_email}, ITEM_PROJECTION))
         serialized_items = [serialize_doc(item) for item in items]
         return jsonify({"success": True, "items": serialized_items})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/items', methods=['POST'])
+def validate_item_fields(data, require_price=True):
+    """Validate new item input, returning (fields, None) or (None, error message).
+    
+    Without require_price a missing price is allowed and returned as None, for
+    stock top-ups of items that already exist.
+    """
+    item_name = str(data.get('item_name') or '').strip()
+    if not item_name:
+        return None, "Item name is required"
+    
+    item_price = None
+    if data.get('item_price') is None or str(data.get('item_price')).strip() == '':
+        if require_price:
+            return None, "Item price is required"
+    else:
+        try:
+            item_price = float(data.get('item_price'))
+            if item_price < 0:
+                return None, "Price cannot be negative"
+        except (TypeError, ValueError):
+            return None, "Invalid price format"
+    
+    try:
+        stock = int(data.get('stock') or 0)
+        if stock < 0:
+            return None, "Stock cannot be negative"
+    except (TypeError, ValueError):
+        return None, "Invalid stock format"
+    
+    unit = str(data.get('unit') or '').strip()
+    if not unit:
+        unit = 'pcs'
+    
+    reorder_level, error = parse_reorder_level(data.get('reorder_level'))
+    if error:
+        return None, error
+    
+    return {
+        "item_name": item_name, "item_price": item_price, "stock": stock, "unit": unit,
+        "reorder_level": reorder_level
+    }, None
+
+# Reorder alerts: an item is low on stock once stock <= its reorder_level
+# (REORDER_LEVEL_DEFAULT when unset). Crossings are detected when an invoice
+# takes the stock, and the low-stock list is an index range on stock.
+REORDER_LEVEL_DEFAULT = int(os.getenv('REORDER_LEVEL_DEFAULT', 5))
+LOW_STOCK_DEFAULT_LIMIT = 100
+LOW_STOCK_MAX_LIMIT = 1000
+
+def parse_reorder_level(value):
+    """Optional reorder level input: (level or None when not given, error message or None)"""
+    if value is None or str(value).strip() == '':
+        return None, None
+    try:
+        level = int(value)
+    except (TypeError, ValueError):
+        return None, "Invalid reorder level format"
+    if level < 0:
+        return None, "Reorder level cannot be negative"
+    return level, None
+
+def note_reorder_level(user_email, level):
+    """Raise the shop's highest reorder level, which bounds the low-stock index scan"""
+    if level is not None and level > REORDER_LEVEL_DEFAULT:
+        auth_collection.update_one({"email": user_email}, {"$max": {"max_reorder_level": level}})
+
+def low_stock_query(user_email):
+    """Filter for items at or below their reorder level, served by the (user_email, stock) index"""
+    shop = auth_collection.find_one({"email": user_email}, {"max_reorder_level": 1}) or {}
+    return {
+        "user_email": user_email,
+        "stock": {"$lte": max(REORDER_LEVEL_DEFAULT, shop.get('max_reorder_level', 0))},
+        "$expr": {"$lte": ["$stock", {"$ifNull": ["$reorder_level", REORDER_LEVEL_DEFAULT]}]}
+    }
+
+def reorder_crossings(quantities, sold_items):
+    """Items an invoice just took from above their reorder level to at or below it.
+    
+    sold_items are the items as left by the invoice's own stock decrement (see
+    decrement_stock), so concurrent sales of the same item cannot hide or
+    repeat a crossing.
+    """
+    crossed = []
+    for item in sold_items.values():
+        level = item.get('reorder_level', REORDER_LEVEL_DEFAULT)
+        if item['stock'] <= level < item['stock'] + quantities[item['_id']]:
+            crossed.append({
+                "item_id": str(item['_id']),
+                "item_name": item['item_name'],
+                "stock": item['stock'],
+                "reorder_level": level
+            })
+    return crossed
+
+def record_reorder_alerts(user_email, invoice_id, alerts):
+    """Log reorder-point crossings and store them as open alerts for the shop.
+    
+    The invoice is already saved, so a failed write is logged rather than raised.
+    """
+    if not alerts:
+        return
+    for alert in alerts:
+        current_app.logger.warning(
+            "Reorder alert for %s: %s at %s (reorder level %s)",
+            user_email, alert['item_name'], alert['stock'], alert['reorder_level']
+        )
+    now = datetime.now()
+    try:
+        reorder_alerts_collection.insert_many([
+            {
+                "user_email": user_email,
+                "item_id": ObjectId(alert['item_id']),
+                "item_name": alert['item_name'],
+                "stock": alert['stock'],
+                "reorder_level": alert['reorder_level'],
+                "invoice_id": invoice_id,
+                "created_at": now,
+                "acknowledged_at": None
+            }
+            for alert in alerts
+        ])
+    except Exception:
+        current_app.logger.exception("Could not store reorder alerts for %s (invoice %s)", user_email, invoice_id)
+
+@bp.route('/api/items', methods=['POST'])
 @require_auth
 def add_item():
     """Add new item - Requires authentication"""
     try:
         data = request.json
         
-        # Input validation
-        item_name = data.get('item_name', '').strip()
-        if not item_name:
-            return jsonify({"success": False, "error": "Item name is required"}), 400
-        
-        try:
-            item_price = float(data.get('item_price', 0))
-            if item_price < 0:
-                return jsonify({"success": False, "error": "Price cannot be negative"}), 400
-        except (TypeError, ValueError):
-            return jsonify({"success": False, "error": "Invalid price format"}), 400
-        
-        try:
-            stock = int(data.get('stock', 0))
-            if stock < 0:
-                return jsonify({"success": False, "error": "Stock cannot be negative"}), 400
-        except (TypeError, ValueError):
-            return jsonify({"success": False, "error": "Invalid stock format"}), 400
-        
-        unit = data.get('unit', 'pcs').strip()
-        if not unit:
-            unit = 'pcs'
+        # Input validation (the price is only needed when the item is new)
+        fields, error = validate_item_fields(data, require_price=False)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        item_name = fields['item_name']
+        item_price = fields['item_price']
+        stock = fields['stock']
+        unit = fields['unit']
+        reorder_level = fields['reorder_level']
         
         # Check if item already exists for this user
         user_email = request.user_email
         existing_item = items_collection.find_one({"item_name": item_name, "user_email": user_email})
+        if not existing_item and item_price is None:
+            return jsonify({"success": False, "error": "Item price is required"}), 400
+        note_reorder_level(user_email, reorder_level)
         if existing_item:
             # Update stock if item exists
+            changes = {"unit": unit, "updated_at": datetime.now()}
+            if reorder_level is not None:
+                changes["reorder_level"] = reorder_level
             items_collection.update_one(
                 {"item_name": item_name, "user_email": user_email},
-                {"$inc": {"stock": stock}, "$set": {"unit": unit}}
+                {"$inc": {"stock": stock}, "$set": changes}
             )
-            updated_item = items_collection.find_one({"item_name": item_name, "user_email": user_email})
+            updated_item = items_collection.find_one({"item_name": item_name, "user_email": user_email}, ITEM_PROJECTION)
+            item_catalog.put(user_email, updated_item)
             return jsonify({
                 "success": True, 
                 "message": f"Updated stock for {item_name}",
@@ -708,23 +1526,23 @@ def add_item():
             # Create new item with user_email
             item_doc = {
                 "item_name": item_name,
+                "name_lc": normalize_item_name(item_name),
                 "item_price": item_price,
                 "stock": stock,
                 "unit": unit,
                 "user_email": user_email,
-                "created_at": datetime.now()
+                "created_at": datetime.now(),
+                "updated_at": datetime.now()
             }
+            if reorder_level is not None:
+                item_doc["reorder_level"] = reorder_level
             result = items_collection.insert_one(item_doc)
             item_doc["_id"] = result.inserted_id
+            item_catalog.put(user_email, item_doc)
             
             # Generate QR code for the item
-            qr_data = {
-                "item_id": str(item_doc["_id"]),
-                "item_name": item_name,
-                "item_price": item_price,
-                "unit": unit
-            }
-            qr_code = generate_qr_code(json.dumps(qr_data))
+            _, qr_png = item_qr_png(item_doc)
+            qr_code = base64.b64encode(qr_png).decode()
             
             return jsonify({
                 "success": True, 
@@ -735,7 +1553,7 @@ def add_item():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/items/<item_id>', methods=['PUT'])
+@bp.route('/api/items/<item_id>', methods=['PUT'])
 @require_auth
 def update_item(item_id):
     """Update item - Requires authentication"""
@@ -755,12 +1573,14 @@ def update_item(item_id):
         
         data = request.json
         update_data = {}
+        unset_data = {}
         
         # Validate and sanitize inputs
         if 'item_name' in data:
             item_name = data['item_name'].strip()
             if item_name:
                 update_data['item_name'] = item_name
+                update_data['name_lc'] = normalize_item_name(item_name)
         
         if 'item_price' in data:
             try:
@@ -780,7 +1600,7 @@ def update_item(item_id):
                 if data.get('update_type') == 'add':
                     items_collection.update_one(
                         {"_id": ObjectId(item_id)},
-                        {"$inc": {"stock": stock_value}}
+                        {"$inc": {"stock": stock_value}, "$set": {"updated_at": datetime.now()}}
                     )
                 else:
                     update_data['stock'] = stock_value
@@ -792,14 +1612,32 @@ def update_item(item_id):
             if unit:
                 update_data['unit'] = unit
         
-        if update_data:
+        if 'reorder_level' in data:
+            reorder_level, error = parse_reorder_level(data['reorder_level'])
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            if reorder_level is None:
+                # Cleared: fall back to the default level
+                unset_data['reorder_level'] = ""
+            else:
+                update_data['reorder_level'] = reorder_level
+                note_reorder_level(user_email, reorder_level)
+        
+        if update_data or unset_data:
             update_data['updated_at'] = datetime.now()
-            items_collection.update_one(
-                {"_id": ObjectId(item_id)},
-                {"$set": update_data}
-            )
+            changes = {"$set": update_data}
+            if unset_data:
+                changes["$unset"] = unset_data
+            items_collection.update_one({"_id": ObjectId(item_id)}, changes)
+        
+        updated_item = items_collection.find_one({"_id": ObjectId(item_id)}, ITEM_PROJECTION)
+        item_catalog.put(user_email, updated_item)
+        
+        # Free the old QR code if its payload changed
+        _, old_qr_key = item_qr_key(existing_item)
+        if item_qr_key(updated_item)[1] != old_qr_key:
+            qr_cache.invalidate(old_qr_key)
         
-        updated_item = items_collection.find_one({"_id": ObjectId(item_id)})
         return jsonify({
             "success": True,
             "message": "Item updated successfully",
@@ -808,7 +1646,7 @@ def update_item(item_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/items/<item_id>', methods=['DELETE'])
+@bp.route('/api/items/<item_id>', methods=['DELETE'])
 @require_auth
 def delete_item(item_id):
     """Delete item - Requires authentication"""
@@ -820,15 +1658,68 @@ def delete_item(item_id):
             return jsonify({"success": False, "error": "Invalid item ID"}), 400
         
         user_email = request.user_email
-        result = items_collection.delete_one({"_id": ObjectId(item_id), "user_email": user_email})
-        if result.deleted_count > 0:
+        deleted_item = items_collection.find_one_and_delete({"_id": ObjectId(item_id), "user_email": user_email})
+        if deleted_item:
+            qr_cache.invalidate(item_qr_key(deleted_item)[1])
+            item_catalog.remove(user_email, deleted_item['_id'])
             return jsonify({"success": True, "message": "Item deleted successfully"})
         else:
             return jsonify({"success": False, "error": "Item not found or access denied"}), 404
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/items/<item_id>/qrcode', methods=['GET'])
+@bp.route('/api/items/low-stock', methods=['GET'])
+@require_auth
+def get_low_stock_items():
+    """Items at or below their reorder level, lowest stock first - Requires authentication"""
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit') or LOW_STOCK_DEFAULT_LIMIT), 1), LOW_STOCK_MAX_LIMIT)
+        except ValueError:
+            return jsonify({"success": False, "error": "limit must be a whole number"}), 400
+        
+        items = []
+        for item in items_collection.find(low_stock_query(request.user_email), ITEM_PROJECTION).sort("stock", 1).limit(limit):
+            item['reorder_level'] = item.get('reorder_level', REORDER_LEVEL_DEFAULT)
+            item['shortfall'] = item['reorder_level'] - item['stock']
+            items.append(serialize_doc(item))
+        return jsonify({"success": True, "items": items, "count": len(items)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+REORDER_ALERTS_LIMIT = 100
+
+@bp.route('/api/items/reorder-alerts', methods=['GET'])
+@require_auth
+def get_reorder_alerts():
+    """Reorder alerts raised by invoices, newest first; open ones only unless all=1 - Requires authentication"""
+    try:
+        query = {"user_email": request.user_email}
+        if request.args.get('all', '').lower() not in ('1', 'true'):
+            query["acknowledged_at"] = None
+        alerts = reorder_alerts_collection.find(query).sort("created_at", -1).limit(REORDER_ALERTS_LIMIT)
+        return jsonify({"success": True, "alerts": [serialize_doc(alert) for alert in alerts]})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/items/reorder-alerts/<alert_id>/acknowledge', methods=['POST'])
+@require_auth
+def acknowledge_reorder_alert(alert_id):
+    """Mark a reorder alert as handled - Requires authentication"""
+    try:
+        if not ObjectId.is_valid(alert_id):
+            return jsonify({"success": False, "error": "Invalid alert ID"}), 400
+        result = reorder_alerts_collection.update_one(
+            {"_id": ObjectId(alert_id), "user_email": request.user_email, "acknowledged_at": None},
+            {"$set": {"acknowledged_at": datetime.now()}}
+        )
+        if result.matched_count == 0:
+            return jsonify({"success": False, "error": "Open alert not found or access denied"}), 404
+        return jsonify({"success": True, "message": "Alert acknowledged"})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/items/<item_id>/qrcode', methods=['GET'])
 @require_auth
 def get_item_qrcode(item_id):
     """Get QR code for specific item - Requires authentication"""
@@ -846,13 +1737,8 @@ def get_item_qrcode(item_id):
             return jsonify({"success": False, "error": "Item not found or access denied"}), 404
         
         # Generate QR code
-        qr_data = {
-            "item_id": str(item["_id"]),
-            "item_name": item["item_name"],
-            "item_price": item["item_price"],
-            "unit": item.get("unit", "pcs")
-        }
-        qr_code = generate_qr_code(json.dumps(qr_data))
+        _, qr_png = item_qr_png(item)
+        qr_code = base64.b64encode(qr_png).decode()
         
         return jsonify({
             "success": True,
@@ -862,87 +1748,663 @@ def get_item_qrcode(item_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/items/search', methods=['GET'])
+@bp.route('/api/items/<item_id>/qrcode.png', methods=['GET'])
 @require_auth
-def search_items():
-    """Search items by name - Requires authentication"""
+def get_item_qrcode_png(item_id):
+    """Get an item's QR code as a PNG image with an ETag - Requires authentication"""
     try:
-        search_term = request.args.get('q', '').strip()
-        if not search_term:
-            return jsonify({"success": True, "items": []})
+        try:
+            item_oid = ObjectId(item_id)
+        except Exception:
+            return jsonify({"success": False, "error": "Invalid item ID"}), 400
         
-        # Sanitize search term to prevent NoSQL injection
-        search_term = search_term.replace('$', '').replace('{', '').replace('}', '')
+        item = items_collection.find_one(
+            {"_id": item_oid, "user_email": request.user_email},
+            {"item_name": 1, "item_price": 1, "unit": 1}
+        )
+        if not item:
+            return jsonify({"success": False, "error": "Item not found or access denied"}), 404
         
-        user_email = request.user_email
-        items = list(items_collection.find({
-            "item_name": {"$regex": search_term, "$options": "i"},
-            "user_email": user_email
-        }))
-        serialized_items = [serialize_doc(item) for item in items]
-        return jsonify({"success": True, "items": serialized_items})
+        qr_key, qr_png = item_qr_png(item)
+        return send_file(BytesIO(qr_png), mimetype='image/png', etag=qr_key,
+                         download_name=f"qrcode_{item_id}.png")
     except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
+        return jsonify({"success": False, "error": str(e)}), 400
 
-# Customer Management Endpoints
-@app.route('/api/customers', methods=['GET'])
+# QR label sheet layout: 5 x 8 labels on a letter page
+QR_LABEL_COLUMNS = 5
+QR_LABEL_ROWS = 8
+QR_LABEL_MARGIN = 36
+QR_LABEL_SIZE = 60
+
+def fit_text(c, text, font, size, width):
+    """Truncate text with an ellipsis so it fits within width"""
+    if c.stringWidth(text, font, size) <= width:
+        return text
+    while text and c.stringWidth(text + "...", font, size) > width:
+        text = text[:-1]
+    return text + "..."
+
+def build_qr_label_sheet(user_email, params):
+    """Render QR labels for the requested items (params['ids'], default all) into one PDF.
+    
+    Returns (PDF bytes, download name, mimetype). Raises ValueError for bad IDs
+    and NotFoundError when there are no items.
+    """
+    query = {"user_email": user_email}
+    ids = params.get('ids')
+    if ids:
+        if isinstance(ids, str):
+            ids = [item_id for item_id in ids.split(',') if item_id.strip()]
+        try:
+            query["_id"] = {"$in": [ObjectId(item_id.strip()) for item_id in ids]}
+        except Exception:
+            raise ValueError("Invalid item ID in ids")
+    
+    items = items_collection.find(query, {"item_name": 1, "item_price": 1, "unit": 1}).sort("item_name", 1)
+    
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    cell_width = (letter[0] - 2 * QR_LABEL_MARGIN) / QR_LABEL_COLUMNS
+    cell_height = (letter[1] - 2 * QR_LABEL_MARGIN) / QR_LABEL_ROWS
+    per_page = QR_LABEL_COLUMNS * QR_LABEL_ROWS
+    count = 0
+    for item in items:
+        if count and count % per_page == 0:
+            c.showPage()
+        position = count % per_page
+        column, row = position % QR_LABEL_COLUMNS, position // QR_LABEL_COLUMNS
+        x = QR_LABEL_MARGIN + column * cell_width
+        top = letter[1] - QR_LABEL_MARGIN - row * cell_height
+        
+        _, qr_png = item_qr_png(item)
+        c.drawImage(ImageReader(BytesIO(qr_png)), x + (cell_width - QR_LABEL_SIZE) / 2,
+                    top - QR_LABEL_SIZE - 4, QR_LABEL_SIZE, QR_LABEL_SIZE)
+        c.setFont("Helvetica-Bold", 7)
+        c.drawCentredString(x + cell_width / 2, top - QR_LABEL_SIZE - 13,
+                            fit_text(c, item["item_name"], "Helvetica-Bold", 7, cell_width - 6))
+        c.setFont("Helvetica", 7)
+        c.drawCentredString(x + cell_width / 2, top - QR_LABEL_SIZE - 22,
+                            f"Rs {item['item_price']:.2f} / {item.get('unit', 'pcs')}")
+        count += 1
+    
+    if not count:
+        raise NotFoundError("No items found")
+    c.save()
+    return buffer.getvalue(), "qr_labels.pdf", 'application/pdf'
+
+@bp.route('/api/items/qr-labels', methods=['GET'])
 @require_auth
-def get_customers():
-    """Get all customers for current user - Requires authentication"""
+def get_qr_label_sheet():
+    """Printable PDF sheet of QR labels - Requires authentication
+    
+    ?ids=<id>,<id>,... selects items (default: all items); ?async=1 queues a job.
+    """
     try:
-        user_email = request.user_email
-        customers = list(customers_collection.find({"user_email": user_email}).sort("created_at", -1))
-        
-        # Calculate total purchases and spent for each customer
-        for customer in customers:
-            customer_email = customer.get('customer_email', '')
-            customer_phone = customer.get('customer_phone', '')
-            
-            # Find all invoices for this customer (by email or phone)
-            customer_invoices = list(invoices_collection.find({
-                "user_email": user_email,
-                "$or": [
-                    {"customer_email": customer_email},
-                    {"customer_number": customer_phone}
-                ]
-            }))
-            
-            # Calculate totals
-            customer['total_purchases'] = len(customer_invoices)
-            customer['total_spent'] = sum(invoice.get('total', 0) for invoice in customer_invoices)
+        if wants_async():
+            return queued_job_response('qr_labels', job_params_from_request())
         
-        serialized_customers = [serialize_doc(customer) for customer in customers]
-        return jsonify({"success": True, "customers": serialized_customers})
+        try:
+            pdf_bytes, download_name, mimetype = build_qr_label_sheet(request.user_email, request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except NotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        
+        return send_file(BytesIO(pdf_bytes), as_attachment=True,
+                         download_name=download_name, mimetype=mimetype)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/customers', methods=['POST'])
+ITEM_SEARCH_DEFAULT_LIMIT = 50
+ITEM_SEARCH_MAX_LIMIT = 200
+
+def search_items_ranked(user_email, search_term, limit=ITEM_SEARCH_DEFAULT_LIMIT):
+    """Find items matching search_term, best matches first.
+    
+    Names starting with the term come first (anchored range scan on the
+    (user_email, name_lc) index), then whole-word matches from the text
+    index, then names containing the term anywhere. Later tiers only run
+    while the result is still short of limit.
+    """
+    term_lc = normalize_item_name(search_term)
+    if not term_lc:
+        return []
+    items = []
+    seen = set()
+    
+    def add_items(cursor):
+        for item in cursor:
+            if item['_id'] not in seen and len(items) < limit:
+                seen.add(item['_id'])
+                items.append(item)
+    
+    # 1. Prefix matches - exact name first, then alphabetical
+    prefix_items = list(items_collection.find({
+        "user_email": user_email,
+        "name_lc": {"$regex": "^" + re.escape(term_lc)}
+    }, ITEM_PROJECTION).sort("name_lc", 1).limit(limit))
+    prefix_items.sort(key=lambda item: item.get('name_lc') != term_lc)
+    add_items(prefix_items)
+    
+    # 2. Token matches from the text index, by relevance
+    tokens = re.findall(r'\w+', term_lc)
+    if tokens and len(items) < limit:
+        try:
+            add_items(items_collection.find(
+                {"user_email": user_email, "$text": {"$search": ' '.join(tokens)}},
+                {**ITEM_PROJECTION, "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(limit))
+        except Exception as e:
+            print(f"Text search unavailable, skipping token matches: {e}")
+    
+    # 3. Substring matches - scans the user's name_lc index keys, so keep it last
+    if len(items) < limit:
+        add_items(items_collection.find({
+            "user_email": user_email,
+            "name_lc": {"$regex": re.escape(term_lc)}
+        }, ITEM_PROJECTION).sort("name_lc", 1).limit(limit + len(items)))
+    
+    for item in items:
+        item.pop('score', None)
+    return items
+
+def item_trigrams(word):
+    """Trigrams of a word padded like pg_trgm ("  milk "), so short words and word starts still match"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance (typos and swapped letters), or max_distance + 1 once exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class ShopCatalog:
+    """In-memory search index over one shop's items.
+    
+    Keeps the serialized items, a sorted list of names for whole-name prefix
+    lookups, a sorted vocabulary of name words for word-prefix lookups and a
+    trigram index over that vocabulary for substring and typo-tolerant
+    matches. All access goes through ``lock``.
+    """
+    
+    # Match kinds for query words, best first; an item ranks by its weakest word
+    WORD_PREFIX, SUBSTRING, FUZZY = 3, 2, 1
+    
+    def __init__(self, items):
+        self.lock = threading.Lock()
+        self.loaded_at = time.time()
+        self.items = {}
+        self.name_keys = {}
+        self.names = []
+        self.words = []
+        self.word_items = {}
+        self.trigram_words = {}
+        for item in items:
+            self._add(item, keep_sorted=False)
+        self.names.sort()
+        self.words.sort()
+    
+    def _add(self, item, keep_sorted=True):
+        item_id = item['_id']
+        name_lc = item.get('name_lc') or normalize_item_name(item.get('item_name'))
+        self.items[item_id] = item
+        self.name_keys[item_id] = name_lc
+        if keep_sorted:
+            bisect.insort(self.names, (name_lc, item_id))
+        else:
+            self.names.append((name_lc, item_id))
+        for word in set(name_lc.split()):
+            if word not in self.word_items:
+                self.word_items[word] = set()
+                if keep_sorted:
+                    bisect.insort(self.words, word)
+                else:
+                    self.words.append(word)
+                for trigram in item_trigrams(word):
+                    self.trigram_words.setdefault(trigram, set()).add(word)
+            self.word_items[word].add(item_id)
+    
+    def _remove(self, item_id):
+        if self.items.pop(item_id, None) is None:
+            return
+        name_lc = self.name_keys.pop(item_id)
+        index = bisect.bisect_left(self.names, (name_lc, item_id))
+        if index < len(self.names) and self.names[index] == (name_lc, item_id):
+            del self.names[index]
+        for word in set(name_lc.split()):
+            holders = self.word_items.get(word)
+            if holders is None:
+                continue
+            holders.discard(item_id)
+            if not holders:
+                del self.word_items[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+                for trigram in item_trigrams(word):
+                    self.trigram_words[trigram].discard(word)
+                    if not self.trigram_words[trigram]:
+                        del self.trigram_words[trigram]
+    
+    def put(self, item):
+        """Add or replace a serialized item"""
+        with self.lock:
+            self._remove(item['_id'])
+            self._add(item)
+    
+    def remove(self, item_id):
+        with self.lock:
+            self._remove(item_id)
+    
+    @staticmethod
+    def _prefix_scan(sorted_values, prefix):
+        """Entries of a sorted list of strings or (string, ...) tuples starting with prefix"""
+        keyed = bool(sorted_values) and isinstance(sorted_values[0], tuple)
+        index = bisect.bisect_left(sorted_values, (prefix,) if keyed else prefix)
+        while index < len(sorted_values):
+            value = sorted_values[index]
+            if not (value[0] if keyed else value).startswith(prefix):
+                break
+            yield value
+            index += 1
+    
+    def _match_token(self, token, is_last, thorough):
+        """Vocabulary words matching one query word, as {word: (kind, similarity)}.
+        
+        Only word prefixes are looked up unless thorough is set, which adds
+        substring and typo-tolerant matches.
+        """
+        matches = {}
+        for word in self._prefix_scan(self.words, token):
+            matches[word] = (self.WORD_PREFIX, len(token) / len(word))
+        if not thorough or len(token) < 3:
+            return matches
+        
+        # Substrings: every trigram of the token must appear in the word
+        candidates = None
+        for i in range(len(token) - 2):
+            words = self.trigram_words.get(token[i:i + 3], set())
+            candidates = set(words) if candidates is None else candidates & words
+            if not candidates:
+                break
+        for word in candidates or ():
+            if word not in matches and token in word:
+                matches[word] = (self.SUBSTRING, len(token) / len(word))
+        
+        # Typos: words sharing a trigram with the token within a small edit distance.
+        # The last word may still be half typed, so it is also compared with word prefixes.
+        max_distance = 1 if len(token) <= 5 else 2
+        candidates = set()
+        for trigram in item_trigrams(token):
+            candidates |= self.trigram_words.get(trigram, set())
+        for word in candidates - matches.keys():
+            distance = edit_distance(token, word, max_distance)
+            if is_last and len(word) > len(token):
+                distance = min(distance, edit_distance(token, word[:len(token)], max_distance))
+            if distance <= max_distance:
+                matches[word] = (self.FUZZY, 1 - distance / (len(token) + 1))
+        return matches
+    
+    def _match_tokens(self, tokens, thorough, exclude):
+        """Items where every query word matches a word of the name, as {item_id: (kind, similarity)}"""
+        per_token = []
+        for position, token in enumerate(tokens):
+            best = {}
+            for word, match in self._match_token(token, position == len(tokens) - 1, thorough).items():
+                for item_id in self.word_items[word]:
+                    if match > best.get(item_id, (0, 0)):
+                        best[item_id] = match
+            if not best:
+                return {}
+            per_token.append(best)
+        
+        if len(per_token) == 1:
+            return {item_id: match for item_id, match in per_token[0].items() if item_id not in exclude}
+        per_token.sort(key=len)
+        ranked = {}
+        for item_id in per_token[0]:
+            if item_id in exclude or not all(item_id in best for best in per_token[1:]):
+                continue
+            matches = [best[item_id] for best in per_token]
+            ranked[item_id] = (
+                min(kind for kind, _ in matches),
+                sum(similarity for _, similarity in matches) / len(matches)
+            )
+        return ranked
+    
+    def search(self, query, limit):
+        """Serialized items matching query, best first"""
+        query_lc = normalize_item_name(query)
+        tokens = query_lc.split()
+        if not tokens:
+            return []
+        with self.lock:
+            # Names are sorted, so the whole-name prefix matches come out exact match first
+            found = []
+            for _, item_id in self._prefix_scan(self.names, query_lc):
+                found.append(item_id)
+                if len(found) >= limit:
+                    return [self.items[item_id] for item_id in found]
+            
+            # The typo-tolerant pass only runs when word prefixes can't fill the page
+            wanted = limit - len(found)
+            ranked = self._match_tokens(tokens, False, set(found))
+            if len(ranked) < wanted:
+                ranked = self._match_tokens(tokens, True, set(found))
+            found += heapq.nsmallest(
+                wanted, ranked,
+                key=lambda item_id: (-ranked[item_id][0], -ranked[item_id][1], self.name_keys[item_id])
+            )
+            return [self.items[item_id] for item_id in found]
+
+class ItemCatalog:
+    """Per-process LRU of ShopCatalog indexes, loaded lazily per shop.
+    
+    Item writes in this process are applied in place; ``ttl_seconds`` bounds
+    how long changes made by other gunicorn workers stay invisible.
+    """
+    
+    def __init__(self, max_shops=0, ttl_seconds=300):
+        self.max_shops = max_shops
+        self.ttl_seconds = ttl_seconds
+        self._shops = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+    
+    @property
+    def enabled(self):
+        return self.max_shops > 0
+    
+    def loaded(self, user_email):
+        """The shop's index if it is loaded and fresh, otherwise None"""
+        with self._lock:
+            shop = self._shops.get(user_email)
+            if shop is None:
+                return None
+            if time.time() - shop.loaded_at > self.ttl_seconds:
+                del self._shops[user_email]
+                return None
+            self._shops.move_to_end(user_email)
+            return shop
+    
+    def get(self, user_email):
+        """The shop's index, loading it from MongoDB on a miss"""
+        shop = self.loaded(user_email)
+        if shop is not None:
+            self.hits += 1
+            return shop
+        items = items_collection.find({"user_email": user_email}, ITEM_PROJECTION)
+        shop = ShopCatalog(serialize_doc(item) for item in items)
+        with self._lock:
+            self.loads += 1
+            self._shops[user_email] = shop
+            self._shops.move_to_end(user_email)
+            while len(self._shops) > self.max_shops:
+                self._shops.popitem(last=False)
+                self.evictions += 1
+        return shop
+    
+    def search(self, user_email, query, limit):
+        return self.get(user_email).search(query, limit)
+    
+    def put(self, user_email, item):
+        """Apply an added or updated item to the shop's index, if loaded"""
+        shop = self.loaded(user_email)
+        if shop is not None:
+            shop.put(serialize_doc(item))
+    
+    def remove(self, user_email, item_id):
+        shop = self.loaded(user_email)
+        if shop is not None:
+            shop.remove(str(item_id))
+    
+    def refresh(self, user_email, item_ids):
+        """Re-read items whose stock changed elsewhere (e.g. sold on an invoice)"""
+        shop = self.loaded(user_email)
+        if shop is None or not item_ids:
+            return
+        for item in items_collection.find({"_id": {"$in": list(item_ids)}}, ITEM_PROJECTION):
+            shop.put(serialize_doc(item))
+    
+    def invalidate(self, user_email):
+        """Drop the shop's index so the next search reloads it"""
+        with self._lock:
+            self._shops.pop(user_email, None)
+    
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "shops": len(self._shops),
+                "max_shops": self.max_shops,
+                "items": sum(len(shop.items) for shop in self._shops.values()),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
+
+item_catalog = ItemCatalog(
+    max_shops=int(os.getenv('ITEM_CATALOG_SHOPS', 0)),
+    ttl_seconds=int(os.getenv('ITEM_CATALOG_TTL', 300))
+)
+
+@bp.route('/api/items/search', methods=['GET'])
 @require_auth
-def add_customer():
-    """Add new customer - Requires authentication"""
+def search_items():
+    """Search items by name, best matches first - Requires authentication"""
     try:
-        data = request.json
-        user_email = request.user_email
-        
-        # Input validation
-        customer_name = data.get('customer_name', '').strip()
-        customer_phone = data.get('customer_phone', '').strip()
-        customer_email = data.get('customer_email', '').strip()
-        customer_address = data.get('customer_address', '').strip()
+        search_term = request.args.get('q', '').strip()
+        if not search_term:
+            return jsonify({"success": True, "items": [], "has_more": False})
         
-        if not customer_name:
-            return jsonify({"success": False, "error": "Customer name is required"}), 400
-        if not customer_phone:
-            return jsonify({"success": False, "error": "Customer phone is required"}), 400
-        if not customer_email:
-            return jsonify({"success": False, "error": "Customer email is required"}), 400
-        if not customer_address:
-            return jsonify({"success": False, "error": "Customer address is required"}), 400
+        try:
+            limit = int(request.args.get('limit', ITEM_SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"success": False, "error": "limit must be a number"}), 400
+        limit = max(1, min(limit, ITEM_SEARCH_MAX_LIMIT))
+        
+        user_email = request.user_email
+        # One extra match tells the client the list was cut off at limit
+        if item_catalog.enabled:
+            # Served from this worker's in-memory index, with typo tolerance
+            serialized_items = item_catalog.search(user_email, search_term, limit + 1)
+        else:
+            items = search_items_ranked(user_email, search_term, limit + 1)
+            serialized_items = [serialize_doc(item) for item in items]
+        has_more = len(serialized_items) > limit
+        return jsonify({"success": True, "items": serialized_items[:limit], "has_more": has_more})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def attach_customer_totals(customers, user_email):
+    """Set total_purchases/total_spent on each customer with a single aggregation.
+    
+    An invoice counts towards a customer when its customer_email matches the
+    customer's email OR its customer_phone_e164 matches the customer's
+    phone_e164, so "98765 43210" and "+91 9876543210" are the same customer.
+    """
+    if not customers:
+        return customers
+    
+    emails = list({customer.get('customer_email', '') for customer in customers})
+    phones = list({customer_phone_key(customer) for customer in customers} - {''})
+    
+    # Group matching invoices by (email, number) pair
+    groups = invoices_collection.aggregate([
+        {"$match": {
+            "user_email": user_email,
+            "$or": [
+                {"customer_email": {"$in": emails}},
+                {"customer_phone_e164": {"$in": phones}}
+            ]
+        }},
+        {"$group": {
+            "_id": {"email": "$customer_email", "number": "$customer_phone_e164"},
+            "count": {"$sum": 1},
+            "total": {"$sum": "$total"}
+        }}
+    ])
+    
+    by_email = {}
+    by_number = {}
+    by_pair = {}
+    for group in groups:
+        email = group['_id'].get('email')
+        number = group['_id'].get('number')
+        for index, key in ((by_email, email), (by_number, number), (by_pair, (email, number))):
+            count, total = index.get(key, (0, 0))
+            index[key] = (count + group['count'], total + group['total'])
+    
+    for customer in customers:
+        email = customer.get('customer_email', '')
+        phone = customer_phone_key(customer)
+        # Inclusion-exclusion so invoices matching both email and phone count once
+        email_count, email_total = by_email.get(email, (0, 0))
+        phone_count, phone_total = by_number.get(phone, (0, 0))
+        both_count, both_total = by_pair.get((email, phone), (0, 0))
+        customer['total_purchases'] = email_count + phone_count - both_count
+        customer['total_spent'] = email_total + phone_total - both_total
+    
+    return customers
+
+def customer_phone_key(customer):
+    """A customer's phone_e164, derived from customer_phone if it was never stored"""
+    if 'phone_e164' in customer:
+        return customer['phone_e164']
+    return normalize_phone(customer.get('customer_phone'))
+
+def increment_customer_totals(user_email, customer_email, customer_phone_e164, total, session=None):
+    """Add one invoice to the stored rollups of every customer it belongs to"""
+    match = [{"customer_email": customer_email}]
+    if customer_phone_e164:
+        match.append({"phone_e164": customer_phone_e164})
+    customers_collection.update_many(
+        {"user_email": user_email, "$or": match},
+        {
+            "$inc": {"total_purchases": 1, "total_spent": total},
+            "$set": {"updated_at": datetime.now()}
+        },
+        session=session
+    )
+
+def refresh_customer_totals(customer):
+    """Recompute and store the rollups for a single customer"""
+    attach_customer_totals([customer], customer['user_email'])
+    customers_collection.update_one(
+        {"_id": customer['_id']},
+        {"$set": {
+            "total_purchases": customer['total_purchases'],
+            "total_spent": customer['total_spent']
+        }}
+    )
+    return customer
+
+def rebuild_customer_totals(user_email=None, batch_size=500):
+    """Recompute stored customer rollups from invoices, optionally for one shop"""
+    shops = [user_email] if user_email else customers_collection.distinct("user_email")
+    updated = 0
+    for shop_email in shops:
+        cursor = customers_collection.find(
+            {"user_email": shop_email},
+            {"customer_email": 1, "customer_phone": 1, "phone_e164": 1}
+        )
+        batch = []
+        for customer in cursor:
+            batch.append(customer)
+            if len(batch) >= batch_size:
+                updated += _write_customer_totals(batch, shop_email)
+                batch = []
+        if batch:
+            updated += _write_customer_totals(batch, shop_email)
+    return updated
+
+def _write_customer_totals(customers, user_email):
+    attach_customer_totals(customers, user_email)
+    customers_collection.bulk_write([
+        UpdateOne({"_id": customer['_id']}, {"$set": {
+            "total_purchases": customer['total_purchases'],
+            "total_spent": customer['total_spent']
+        }})
+        for customer in customers
+    ], ordered=False)
+    return len(customers)
+
+@bp.cli.command('rebuild-customer-totals')
+@click.option('--user-email', default=None, help='Only rebuild customers of this shop')
+def rebuild_customer_totals_command(user_email):
+    """Backfill customers.total_purchases/total_spent from existing invoices"""
+    updated = rebuild_customer_totals(user_email)
+    print(f"Rebuilt purchase totals for {updated} customers")
+
+# Customer Management Endpoints
+@bp.route('/api/customers', methods=['GET'])
+@require_auth
+def get_customers():
+    """Get all customers for current user - Requires authentication"""
+    try:
+        user_email = request.user_email
+        customers = list(customers_collection.find({"user_email": user_email}).sort("created_at", -1))
+        
+        serialized_customers = [serialize_doc(customer) for customer in customers]
+        return jsonify({"success": True, "customers": serialized_customers})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def validate_customer_fields(data):
+    """Validate new customer input, returning (fields, None) or (None, error message)"""
+    fields = {}
+    for field, label in (("customer_name", "name"), ("customer_phone", "phone"),
+                         ("customer_email", "email"), ("customer_address", "address")):
+        value = str(data.get(field) or '').strip()
+        if not value:
+            return None, f"Customer {label} is required"
+        fields[field] = value
+    if not normalize_phone(fields['customer_phone']):
+        return None, "Customer phone is not a valid phone number"
+    return fields, None
+
+@bp.route('/api/customers', methods=['POST'])
+@require_auth
+def add_customer():
+    """Add new customer - Requires authentication"""
+    try:
+        data = request.json
+        user_email = request.user_email
         
-        # Check if customer with same phone already exists for this user
+        # Input validation
+        fields, error = validate_customer_fields(data)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        customer_name = fields['customer_name']
+        customer_phone = fields['customer_phone']
+        customer_email = fields['customer_email']
+        customer_address = fields['customer_address']
+        
+        # Check if customer with same phone already exists for this user,
+        # however the number was formatted
+        lookup_keys = customer_lookup_keys(customer_phone, customer_email)
         existing_customer = customers_collection.find_one({
-            "customer_phone": customer_phone,
-            "user_email": user_email
+            "user_email": user_email,
+            "phone_e164": lookup_keys['phone_e164']
         })
         
         if existing_customer:
@@ -954,6 +2416,7 @@ def add_customer():
             "customer_phone": customer_phone,
             "customer_email": customer_email,
             "customer_address": customer_address,
+            **lookup_keys,
             "user_email": user_email,
             "total_purchases": 0,
             "total_spent": 0,
@@ -961,9 +2424,16 @@ def add_customer():
             "updated_at": datetime.now()
         }
         
-        result = customers_collection.insert_one(customer)
+        try:
+            result = customers_collection.insert_one(customer)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent add of the same number
+            return jsonify({"success": False, "error": "Customer with this phone number already exists"}), 400
         customer['_id'] = result.inserted_id
         
+        # Pick up invoices issued before the customer was saved
+        refresh_customer_totals(customer)
+        
         return jsonify({
             "success": True,
             "message": "Customer added successfully",
@@ -972,7 +2442,7 @@ def add_customer():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/customers/<customer_id>', methods=['PUT'])
+@bp.route('/api/customers/<customer_id>', methods=['PUT'])
 @require_auth
 def update_customer(customer_id):
     """Update customer information - Requires authentication"""
@@ -1000,30 +2470,42 @@ def update_customer(customer_id):
         if 'customer_phone' in data:
             customer_phone = data['customer_phone'].strip()
             if customer_phone:
+                phone_e164 = normalize_phone(customer_phone)
+                if not phone_e164:
+                    return jsonify({"success": False, "error": "Customer phone is not a valid phone number"}), 400
                 # Check if phone number is already used by another customer
                 existing = customers_collection.find_one({
-                    "customer_phone": customer_phone,
                     "user_email": user_email,
+                    "phone_e164": phone_e164,
                     "_id": {"$ne": ObjectId(customer_id)}
                 })
                 if existing:
                     return jsonify({"success": False, "error": "Phone number already in use by another customer"}), 400
                 update_data['customer_phone'] = customer_phone
+                update_data['phone_e164'] = phone_e164
         
         if 'customer_email' in data:
             update_data['customer_email'] = data['customer_email'].strip() if data['customer_email'] else None
+            update_data['email_lc'] = normalize_email(update_data['customer_email'])
         
         if 'customer_address' in data:
             update_data['customer_address'] = data['customer_address'].strip() if data['customer_address'] else None
         
         if update_data:
             update_data['updated_at'] = datetime.now()
-            customers_collection.update_one(
-                {"_id": ObjectId(customer_id)},
-                {"$set": update_data}
-            )
+            try:
+                customers_collection.update_one(
+                    {"_id": ObjectId(customer_id)},
+                    {"$set": update_data}
+                )
+            except DuplicateKeyError:
+                return jsonify({"success": False, "error": "Phone number already in use by another customer"}), 400
         
         updated_customer = customers_collection.find_one({"_id": ObjectId(customer_id)})
+        
+        # Matching invoices change with the phone/email, so recompute rollups
+        if 'customer_phone' in update_data or 'customer_email' in update_data:
+            refresh_customer_totals(updated_customer)
         return jsonify({
             "success": True,
             "message": "Customer updated successfully",
@@ -1032,7 +2514,7 @@ def update_customer(customer_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/customers/<customer_id>', methods=['DELETE'])
+@bp.route('/api/customers/<customer_id>', methods=['DELETE'])
 @require_auth
 def delete_customer(customer_id):
     """Delete customer - Requires authentication"""
@@ -1053,7 +2535,7 @@ def delete_customer(customer_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/customers/search', methods=['GET'])
+@bp.route('/api/customers/search', methods=['GET'])
 @require_auth
 def search_customers():
     """Search customers by name or phone - Requires authentication"""
@@ -1074,38 +2556,265 @@ def search_customers():
             "user_email": user_email
         }))
         
-        # Calculate total purchases and spent for each customer
-        for customer in customers:
-            customer_email = customer.get('customer_email', '')
-            customer_phone = customer.get('customer_phone', '')
-            
-            # Find all invoices for this customer (by email or phone)
-            customer_invoices = list(invoices_collection.find({
-                "user_email": user_email,
-                "$or": [
-                    {"customer_email": customer_email},
-                    {"customer_number": customer_phone}
-                ]
-            }))
-            
-            # Calculate totals
-            customer['total_purchases'] = len(customer_invoices)
-            customer['total_spent'] = sum(invoice.get('total', 0) for invoice in customer_invoices)
-        
         serialized_customers = [serialize_doc(customer) for customer in customers]
         return jsonify({"success": True, "customers": serialized_customers})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-def generate_next_invoice_id():
-    """Generate next sequential invoice ID"""
-    last_invoice = invoices_collection.find().sort("invoice_id", -1).limit(1)
-    last_invoice = list(last_invoice)
+CUSTOMER_LOOKUP_DEFAULT_LIMIT = 10
+CUSTOMER_LOOKUP_MAX_LIMIT = 50
+
+def phone_lookup_prefixes(phone):
+    """E.164 prefixes a partially typed phone number may stand for"""
+    phone = phone.strip()
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('+'):
+        return ['+' + digits]
+    if phone.startswith('00'):
+        return ['+' + digits[2:]]
+    # Typed either as a national number or with the country code but no '+'
+    prefixes = ['+' + PHONE_DEFAULT_COUNTRY_CODE + digits.lstrip('0'), '+' + digits]
+    return list(dict.fromkeys(prefixes))
+
+@bp.route('/api/customers/lookup', methods=['GET'])
+@require_auth
+def lookup_customers():
+    """Find customers by phone or email for the billing screen, exact matches first - Requires authentication
     
-    if last_invoice:
-        return last_invoice[0]["invoice_id"] + 1
+    Query with ?phone= or ?email=. Formatting differences (spaces, dashes,
+    country code, letter case) are ignored. Unless exact=1, customers whose
+    phone/email starts with the input follow the exact matches.
+    """
+    try:
+        phone = request.args.get('phone', '').strip()
+        email = request.args.get('email', '').strip()
+        exact_only = request.args.get('exact', '').lower() in ('1', 'true', 'yes')
+        try:
+            limit = int(request.args.get('limit', CUSTOMER_LOOKUP_DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"success": False, "error": "limit must be a number"}), 400
+        limit = max(1, min(limit, CUSTOMER_LOOKUP_MAX_LIMIT))
+        
+        user_email = request.user_email
+        if phone:
+            if not re.sub(r'\D', '', phone):
+                return jsonify({"success": False, "error": "phone must contain digits"}), 400
+            field = "phone_e164"
+            exact_value = normalize_phone(phone)
+            prefixes = phone_lookup_prefixes(phone)
+        elif email:
+            field = "email_lc"
+            exact_value = normalize_email(email)
+            prefixes = [exact_value]
+        else:
+            return jsonify({"success": False, "error": "phone or email is required"}), 400
+        
+        # A partly typed phone has no E.164 form yet and only matches by prefix
+        customers = list(customers_collection.find({"user_email": user_email, field: exact_value}).limit(limit)) if exact_value else []
+        exact_match = bool(customers)
+        if not exact_only and len(customers) < limit:
+            # Anchored regexes on the (user_email, field) index are range scans
+            customers += customers_collection.find({
+                "user_email": user_email,
+                "_id": {"$nin": [customer['_id'] for customer in customers]},
+                "$or": [{field: {"$regex": "^" + re.escape(prefix)}} for prefix in prefixes]
+            }).sort(field, 1).limit(limit - len(customers))
+        
+        return jsonify({
+            "success": True,
+            "exact_match": exact_match,
+            "customers": [serialize_doc(customer) for customer in customers]
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def generate_next_invoice_id(user_email):
+    """Atomically allocate the next sequential invoice ID"""
+    if INVOICE_ID_SCOPE == 'shop':
+        counter_id = f"invoice_id:{user_email}"
+        existing_filter = {"user_email": user_email}
     else:
-        return 1
+        counter_id = "invoice_id"
+        existing_filter = {}
+    
+    counter = counters_collection.find_one_and_update(
+        {"_id": counter_id},
+        {"$inc": {"seq": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        # First allocation: seed the counter from the highest existing invoice ID
+        last_invoice = list(invoices_collection.find(existing_filter, {"invoice_id": 1}).sort("invoice_id", -1).limit(1))
+        seed = last_invoice[0]["invoice_id"] if last_invoice else 0
+        try:
+            counters_collection.insert_one({"_id": counter_id, "seq": seed})
+        except DuplicateKeyError:
+            pass  # Another worker seeded it first
+        counter = counters_collection.find_one_and_update(
+            {"_id": counter_id},
+            {"$inc": {"seq": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    return counter["seq"]
+
+SOLD_ITEM_FIELDS = {"item_name": 1, "stock": 1, "reorder_level": 1}
+
+def clear_stock_reservations(item_oids):
+    """Drop the reservation marker list from items once no invoice holds a reservation on them"""
+    items_collection.update_many(
+        {"_id": {"$in": list(item_oids)}, "stock_reservations": {"$size": 0}},
+        {"$unset": {"stock_reservations": ""}}
+    )
+
+def decrement_stock(user_email, quantities, reservation=None, session=None):
+    """Take quantities ({item ObjectId: units}) out of stock.
+    
+    Each update only applies while enough stock remains, so stock can never go
+    negative. Inside a transaction the items are decremented in one bulk write
+    and re-read in the same session. Outside one pass a reservation marker:
+    each item is decremented and returned by a single atomic update and
+    tagged with the marker so that, if any guard fails, exactly those items
+    are restored. Returns {item ObjectId: item after the decrement}, or None
+    when an item did not have enough stock.
+    """
+    if not quantities:
+        return {}
+    
+    now = datetime.now()
+    updates = {}
+    for item_oid, quantity in quantities.items():
+        update = {"$inc": {"stock": -quantity}, "$set": {"updated_at": now}}
+        if reservation:
+            update["$addToSet"] = {"stock_reservations": reservation}
+        updates[item_oid] = ({"_id": item_oid, "user_email": user_email, "stock": {"$gte": quantity}}, update)
+    
+    if session is not None:
+        result = items_collection.bulk_write(
+            [UpdateOne(query, update) for query, update in updates.values()], ordered=False, session=session
+        )
+        if result.matched_count != len(quantities):
+            return None
+        # Our writes hold these items until commit, so this is exactly what the decrement left
+        return {
+            item['_id']: item
+            for item in items_collection.find({"_id": {"$in": list(quantities)}}, SOLD_ITEM_FIELDS, session=session)
+        }
+    
+    sold_items = {}
+    for item_oid, (query, update) in updates.items():
+        item = items_collection.find_one_and_update(
+            query, update, projection=SOLD_ITEM_FIELDS, return_document=ReturnDocument.AFTER
+        )
+        if item is None:
+            if reservation:
+                restock(quantities, reservation)
+            return None
+        sold_items[item_oid] = item
+    
+    if reservation:
+        items_collection.update_many(
+            {"_id": {"$in": list(quantities)}},
+            {"$pull": {"stock_reservations": reservation}}
+        )
+        clear_stock_reservations(quantities)
+    return sold_items
+
+def restock(quantities, reservation):
+    """Return reserved units to the items tagged with the reservation marker"""
+    items_collection.bulk_write([
+        UpdateOne(
+            {"_id": item_oid, "stock_reservations": reservation},
+            {
+                "$inc": {"stock": quantity},
+                "$set": {"updated_at": datetime.now()},
+                "$pull": {"stock_reservations": reservation}
+            }
+        )
+        for item_oid, quantity in quantities.items()
+    ], ordered=False)
+    clear_stock_reservations(quantities)
+
+def stock_shortage_names(user_email, quantities):
+    """Names of the items that cannot currently cover the requested quantities"""
+    short = [
+        db_item['item_name']
+        for db_item in items_collection.find(
+            {"_id": {"$in": list(quantities)}, "user_email": user_email},
+            {"item_name": 1, "stock": 1}
+        )
+        if db_item.get('stock', 0) < quantities[db_item['_id']]
+    ]
+    return ", ".join(short) if short else "some items"
+
+class StockShortageError(Exception):
+    """Raised inside an invoice transaction to abort it when stock ran out"""
+
+class NotFoundError(Exception):
+    """Raised by shared helpers when the requested data does not exist for the shop"""
+
+_transactions_supported = None
+
+def supports_transactions():
+    """True when MongoDB is a replica set or sharded cluster (checked once per process)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = db.command('hello')
+            _transactions_supported = bool(hello.get('setName') or hello.get('msg') == 'isdbgrid')
+        except Exception as e:
+            print(f"Could not detect transaction support, using compensating writes: {e}")
+            _transactions_supported = False
+    return _transactions_supported
+
+def save_invoice(invoice_doc, quantities):
+    """Insert an invoice, decrement its stock and update customer and sales rollups atomically.
+    
+    Uses a multi-document transaction when the deployment supports it, and a
+    reserve-then-compensate sequence on standalone servers. Allocates the
+    invoice ID (retrying on a duplicate key) and returns the sold items as
+    left by the decrement ({item ObjectId: item}), or None without saving
+    anything when an item no longer has enough stock.
+    """
+    user_email = invoice_doc['user_email']
+    
+    def write_invoice(session=None):
+        invoices_collection.insert_one(invoice_doc, session=session)
+        if session is not None:
+            sold_items = decrement_stock(user_email, quantities, session=session)
+            if sold_items is None:
+                raise StockShortageError()
+        else:
+            sold_items = decrement_stock(user_email, quantities, reservation=str(invoice_doc['_id']))
+            if sold_items is None:
+                invoices_collection.delete_one({"_id": invoice_doc['_id']})
+                raise StockShortageError()
+        increment_customer_totals(
+            user_email, invoice_doc['customer_email'], invoice_doc['customer_phone_e164'],
+            invoice_doc['total'], session=session
+        )
+        increment_daily_sales(invoice_doc, session=session)
+        return sold_items
+    
+    for attempt in range(3):
+        # IDs are allocated outside the transaction so the counter is never a write conflict
+        invoice_doc["invoice_id"] = generate_next_invoice_id(user_email)
+        invoice_doc.pop("_id", None)
+        try:
+            if supports_transactions():
+                with client.start_session() as session:
+                    sold_items = session.with_transaction(write_invoice)
+            else:
+                sold_items = write_invoice()
+            stats_cache.invalidate(user_email)
+            return sold_items
+        except StockShortageError:
+            invoice_doc.pop("_id", None)
+            return None
+        except DuplicateKeyError:
+            # Invoice ID taken by a manual insert, allocate another
+            if attempt == 2:
+                raise
 
 def calculate_totals(items, tax_rate=0.0, discount_rate=0.0):
     """Calculate invoice totals using provided rates (in percentages) with custom rounding."""
@@ -1130,7 +2839,7 @@ def calculate_totals(items, tax_rate=0.0, discount_rate=0.0):
     
     return subtotal, tax, discount, total
 
-@app.route('/api/invoices', methods=['POST'])
+@bp.route('/api/invoices', methods=['POST'])
 @require_auth
 def create_invoice():
     """Create new invoice with tax rate and discount rate - Requires authentication"""
@@ -1182,6 +2891,7 @@ def create_invoice():
         
         # Validate items and check ownership
         user_email = request.user_email
+        quantities = {}
         for item in items:
             # Validate item structure
             if 'item_id' not in item or 'quantity' not in item:
@@ -1189,7 +2899,7 @@ def create_invoice():
             
             # Validate ObjectId
             try:
-                ObjectId(item['item_id'])
+                item_oid = ObjectId(item['item_id'])
             except Exception:
                 return jsonify({"success": False, "error": f"Invalid item ID: {item['item_id']}"}), 400
             
@@ -1201,33 +2911,46 @@ def create_invoice():
             except (TypeError, ValueError):
                 return jsonify({"success": False, "error": "Invalid quantity format"}), 400
             
-            # Check item exists and belongs to user
-            db_item = items_collection.find_one({"_id": ObjectId(item['item_id']), "user_email": user_email})
+            item['quantity'] = quantity
+            # The same item may appear on several lines; stock is checked against the sum
+            quantities[item_oid] = quantities.get(item_oid, 0) + quantity
+        
+        # Fetch every referenced item that belongs to the user in one query
+        db_items = {
+            db_item['_id']: db_item
+            for db_item in items_collection.find(
+                {"_id": {"$in": list(quantities)}, "user_email": user_email},
+                {"item_name": 1, "item_price": 1, "stock": 1}
+            )
+        }
+        
+        for item_oid, quantity in quantities.items():
+            db_item = db_items.get(item_oid)
             if not db_item:
-                return jsonify({"success": False, "error": f"Item not found or access denied: {item['item_id']}"}), 400
+                return jsonify({"success": False, "error": f"Item not found or access denied: {item_oid}"}), 400
             
-            if item['quantity'] > db_item['stock']:
+            if quantity > db_item['stock']:
                 return jsonify({
                     "success": False, 
                     "error": f"Not enough stock for {db_item['item_name']}. Available: {db_item['stock']}"
                 }), 400
-            
-            # Update item details with current price
+        
+        # Update item details with current price
+        for item in items:
+            db_item = db_items[ObjectId(item['item_id'])]
             item['name'] = db_item['item_name']
             item['price'] = db_item['item_price']
         
         # Calculate totals
         subtotal, tax, discount, total = calculate_totals(items, tax_rate, discount_rate)
         
-        # Generate invoice ID
-        invoice_id = generate_next_invoice_id()
-        
-        # Create invoice document
+        # Create invoice document (invoice_id is allocated when saving)
         invoice_doc = {
-            "invoice_id": invoice_id,
+            "invoice_id": None,
             "customer_name": customer_name,
             "customer_address": customer_address,
             "customer_number": customer_number,
+            "customer_phone_e164": normalize_phone(customer_number),
             "customer_email": customer_email,
             "customer_whatsapp": customer_whatsapp,
             "items": items,
@@ -1241,26 +2964,28 @@ def create_invoice():
             "notes": notes,
             "user_email": user_email,
             "order_date": datetime.now(),
-            "created_at": datetime.now()
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
         }
         
-        # Save invoice
-        result = invoices_collection.insert_one(invoice_doc)
-        
-        # Update stock for all items
-        for item in items:
-            items_collection.update_one(
-                {"_id": ObjectId(item['item_id'])},
-                {"$inc": {"stock": -item['quantity']}}
-            )
-        
-        invoice_doc["_id"] = result.inserted_id
+        # Save invoice and take its stock atomically
+        sold_items = save_invoice(invoice_doc, quantities)
+        if sold_items is None:
+            return jsonify({
+                "success": False,
+                "error": f"Not enough stock for {stock_shortage_names(user_email, quantities)}. Please try again."
+            }), 409
+        invoice_id = invoice_doc["invoice_id"]
+        item_catalog.refresh(user_email, quantities)
+        reorder_alerts = reorder_crossings(quantities, sold_items)
+        record_reorder_alerts(user_email, invoice_id, reorder_alerts)
         
         # Prepare response BEFORE sending email/WhatsApp (send in background)
         response_data = {
             "success": True,
             "message": "Invoice created successfully",
             "invoice": serialize_doc(invoice_doc),
+            "reorder_alerts": reorder_alerts,
             "email_sent": False,
             "whatsapp_sent": False
         }
@@ -1269,9 +2994,8 @@ def create_invoice():
         # Backend returns invoice data and shop details for email
         if send_email and customer_email:
             try:
-                # Get shop details for email template
-                session_token = request.headers.get('Authorization', '').replace('Bearer ', '')
-                shop_info = auth_collection.find_one({"session_token": session_token})
+                # Shop details for the email template come from the (cached) auth document
+                shop_info = request.auth_doc
                 
                 # Prepare email data for frontend
                 response_data["email_data"] = {
@@ -1304,19 +3028,77 @@ def create_invoice():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/api/invoices', methods=['GET'])
+INVOICE_PAGE_MAX_LIMIT = 500
+
+# Projection used by ?fields=summary - everything needed for invoice lists, no line items
+INVOICE_SUMMARY_FIELDS = [
+    "invoice_id", "customer_name", "customer_number", "customer_email",
+    "subtotal", "tax", "discount", "total", "payment_method", "order_date"
+]
+
+def parse_invoice_projection(fields):
+    """Turn the ?fields= parameter into a MongoDB projection (None = full documents)"""
+    if not fields:
+        return None
+    if fields == 'summary':
+        names = INVOICE_SUMMARY_FIELDS
+    else:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        for name in names:
+            if not name.replace('_', '').replace('.', '').isalnum():
+                raise ValueError(f"Invalid field name: {name}")
+    projection = {name: 1 for name in names}
+    projection["invoice_id"] = 1
+    return projection
+
+@bp.route('/api/invoices', methods=['GET'])
 @require_auth
 def get_invoices():
-    """Get all invoices - Requires authentication"""
+    """Get invoices, newest first - Requires authentication
+    
+    Optional query parameters:
+      limit  - page size (keyset pagination, max 500); omit for all invoices
+      after  - return invoices with an ID lower than this (the previous page's next_after)
+      fields - 'summary' to drop line items, or a comma separated list of fields
+    """
     try:
         user_email = request.user_email
-        invoices = list(invoices_collection.find({"user_email": user_email}).sort("invoice_id", -1))
-        serialized_invoices = [serialize_doc(invoice) for invoice in invoices]
-        return jsonify({"success": True, "invoices": serialized_invoices})
+        query = {"user_email": user_email}
+        
+        try:
+            limit = request.args.get('limit', type=int)
+            after = request.args.get('after', type=int)
+            if 'limit' in request.args and (limit is None or limit <= 0):
+                raise ValueError("limit must be a positive integer")
+            if 'after' in request.args and after is None:
+                raise ValueError("after must be an invoice ID")
+            projection = parse_invoice_projection(request.args.get('fields', '').strip())
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if after is not None:
+            query["invoice_id"] = {"$lt": after}
+        
+        # Served by the (user_email, invoice_id) index
+        cursor = invoices_collection.find(query, projection).sort("invoice_id", -1)
+        if limit is None:
+            invoices = list(cursor)
+            return jsonify({"success": True, "invoices": [serialize_doc(invoice) for invoice in invoices]})
+        
+        limit = min(limit, INVOICE_PAGE_MAX_LIMIT)
+        invoices = list(cursor.limit(limit + 1))
+        has_more = len(invoices) > limit
+        invoices = invoices[:limit]
+        return jsonify({
+            "success": True,
+            "invoices": [serialize_doc(invoice) for invoice in invoices],
+            "has_more": has_more,
+            "next_after": invoices[-1]["invoice_id"] if has_more else None
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/invoices/<int:invoice_id>', methods=['GET'])
+@bp.route('/api/invoices/<int:invoice_id>', methods=['GET'])
 @require_auth
 def get_invoice(invoice_id):
     """Get specific invoice - Requires authentication"""
@@ -1334,7 +3116,322 @@ def get_invoice(invoice_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/invoices/<int:invoice_id>/pdf', methods=['GET'])
+pdf_cache = BinaryCache(
+    max_bytes=int(os.getenv('PDF_CACHE_MB', 32)) * 1024 * 1024,
+    disk_dir=os.getenv('PDF_CACHE_DIR') or None,
+    disk_max_files=int(os.getenv('PDF_CACHE_DISK_MAX_FILES', 10000)),
+    suffix='.pdf'
+)
+
+# Bump whenever draw_invoice's output changes, so cached PDFs and ETags from
+# the old layout (kept across deploys in PDF_CACHE_DIR) are not served again
+PDF_LAYOUT_VERSION = 2
+
+def pdf_cache_key(invoice, shop):
+    """Content address of a rendered invoice: the layout version, the invoice and the shop details printed on it"""
+    shop_details = "|".join(str(shop.get(field) or "") for field in ('shop_name', 'shop_address', 'shop_phone', 'email'))
+    raw = f"v{PDF_LAYOUT_VERSION}:{invoice['_id']}:{invoice['invoice_id']}:{shop_details}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+# Invoice PDF layout (points from the bottom of a letter page)
+INVOICE_TABLE_TOP = 580
+INVOICE_CONTINUED_TABLE_TOP = 710
+INVOICE_ROW_HEIGHT = 15
+INVOICE_PAGE_BOTTOM = 80  # Lowest item row; the footer lives below this
+INVOICE_TOTALS_HEIGHT = 105
+
+def draw_invoice_footer(c):
+    """Draw the thank-you note and branding at the bottom of the current page"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    c.setFont("Helvetica", 8)
+    c.setFillColor(colors.grey)
+    c.drawString(50, 50, "Thank you for your business!")
+    
+    # Kandhal Invoice System branding at bottom center
+    c.setFont("Helvetica-Bold", 10)
+    c.setFillColor(colors.HexColor("#138808"))
+    footer_text = "Kandhal Invoice System"
+    text_width = c.stringWidth(footer_text, "Helvetica-Bold", 10)
+    c.drawString((letter[0] - text_width) / 2, 30, footer_text)
+    c.setFont("Helvetica", 7)
+    c.setFillColor(colors.grey)
+    powered_text = "Powered by Kandhal Technologies"
+    powered_width = c.stringWidth(powered_text, "Helvetica", 7)
+    c.drawString((letter[0] - powered_width) / 2, 20, powered_text)
+    c.setFillColor(colors.black)
+
+def draw_invoice_header(c, invoice, shop):
+    """Draw the shop and customer block at the top of an invoice's first page"""
+    from reportlab.lib import colors
+    shop_name = shop.get('shop_name') or "SHOP"
+    
+    # Shop Info Header with dynamic shop name
+    c.setFont("Helvetica-Bold", 20)
+    c.setFillColor(colors.HexColor("#138808"))
+    c.drawString(50, 750, shop_name.upper())
+    c.setFont("Helvetica-Bold", 12)
+    c.setFillColor(colors.black)
+    c.drawString(470, 750, invoice['order_date'].strftime("%d/%m/%Y"))
+    c.line(50, 740, 550, 740)
+    
+    c.setFont("Helvetica", 10)
+    c.drawString(50, 725, f"Address: {shop.get('shop_address', '')}")
+    c.drawString(50, 710, f"Phone: {shop.get('shop_phone', '')}")
+    c.drawString(50, 695, f"Email: {shop.get('email', '')}")
+    
+    # Invoice ID
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(400, 665, f"Invoice ID: {invoice['invoice_id']}")
+    
+    # Customer Info
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, 650, f"To: {invoice['customer_name']}")
+    c.drawString(50, 635, f"Address: {invoice['customer_address']}")
+    c.drawString(50, 620, f"Contact: {invoice['customer_number']}")
+
+def draw_continuation_header(c, invoice, shop, page):
+    """Draw the short header used on an invoice's second and later pages"""
+    from reportlab.lib import colors
+    shop_name = shop.get('shop_name') or "SHOP"
+    c.setFont("Helvetica-Bold", 12)
+    c.setFillColor(colors.HexColor("#138808"))
+    c.drawString(50, 750, shop_name.upper())
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 10)
+    c.drawString(330, 750, f"Invoice ID: {invoice['invoice_id']} (continued) - Page {page}")
+    c.line(50, 740, 550, 740)
+
+def draw_items_table_header(c, y):
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, y, "Item")
+    c.drawString(200, y, "Quantity")
+    c.drawString(280, y, "Price (Rs)")
+    c.drawString(370, y, "Total (Rs)")
+    c.line(50, y-5, 420, y-5)
+
+def draw_invoice(c, invoice, shop):
+    """Draw one invoice on the canvas, breaking onto new pages as the item table fills.
+    
+    Leaves the last page open; callers finish it with showPage() or save().
+    """
+    page = 1
+    
+    def next_page():
+        nonlocal page
+        c.setFont("Helvetica-Oblique", 8)
+        c.drawString(50, 65, "Continued on next page...")
+        draw_invoice_footer(c)
+        c.showPage()
+        page += 1
+        draw_continuation_header(c, invoice, shop, page)
+        draw_items_table_header(c, INVOICE_CONTINUED_TABLE_TOP)
+        c.setFont("Helvetica", 10)
+        return INVOICE_CONTINUED_TABLE_TOP - 20
+    
+    draw_invoice_header(c, invoice, shop)
+    
+    # Items table
+    y = INVOICE_TABLE_TOP
+    draw_items_table_header(c, y)
+    y -= 20
+    c.setFont("Helvetica", 10)
+    for item in invoice['items']:
+        if y < INVOICE_PAGE_BOTTOM:
+            y = next_page()
+        c.drawString(50, y, item["name"])
+        c.drawString(200, y, str(item["quantity"]))
+        c.drawString(280, y, f"Rs {item['price']:.2f}")
+        c.drawString(370, y, f"Rs {item['quantity'] * item['price']:.2f}")
+        y -= INVOICE_ROW_HEIGHT
+    
+    # Keep the totals block together on one page
+    if y - INVOICE_TOTALS_HEIGHT < INVOICE_PAGE_BOTTOM:
+        y = next_page()
+    
+    # Totals
+    y -= 10
+    c.line(50, y, 420, y)
+    y -= 20
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(280, y, f"Subtotal: Rs {invoice['subtotal']:.2f}")
+    y -= 15
+    # Split tax evenly into CGST/SGST for display if applicable
+    half_tax = invoice['tax'] / 2
+    cgst_rate = (invoice.get('tax_rate', 0) / 2)
+    sgst_rate = cgst_rate
+    c.drawString(280, y, f"CGST ({cgst_rate:.2f}%): Rs {half_tax:.2f}")
+    y -= 15
+    c.drawString(280, y, f"SGST ({sgst_rate:.2f}%): Rs {half_tax:.2f}")
+    y -= 15
+    c.drawString(280, y, f"Discount ({invoice.get('discount_rate', 0):.2f}%): -Rs {invoice['discount']:.2f}")
+    y -= 15
+    c.line(280, y, 420, y)
+    y -= 15
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(280, y, f"Total Amount: Rs {invoice['total']:.2f}")
+    
+    draw_invoice_footer(c)
+
+def render_invoice_pdf(invoice, shop):
+    """Render an invoice to PDF bytes in memory"""
+    # reportlab is imported on the first PDF rather than at worker boot
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    draw_invoice(c, invoice, shop)
+    c.save()
+    return buffer.getvalue()
+
+def render_invoice_pdf_chunk(invoices, shop):
+    """Process pool task: render each invoice separately, returning [(invoice_id, pdf bytes)]"""
+    return [(invoice['invoice_id'], render_invoice_pdf(invoice, shop)) for invoice in invoices]
+
+PDF_BATCH_MAX_INVOICES = int(os.getenv('PDF_BATCH_MAX_INVOICES', 5000))
+PDF_BATCH_CHUNK_SIZE = 50
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def get_pdf_pool():
+    """Process pool for batch rendering, started on first use"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            workers = int(os.getenv('PDF_WORKERS', 0)) or os.cpu_count() or 1
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers)
+        return _pdf_pool
+
+def render_invoice_pdfs(invoices, shop):
+    """Render invoices to individual PDFs in invoice order, using the PDF cache and process pool"""
+    global _pdf_pool
+    rendered = {}
+    missing = []
+    for invoice in invoices:
+        pdf_bytes = pdf_cache.get(pdf_cache_key(invoice, shop))
+        if pdf_bytes is None:
+            missing.append(invoice)
+        else:
+            rendered[invoice['invoice_id']] = pdf_bytes
+    
+    if missing:
+        # Only the fields printed on the PDF need to cross the process boundary
+        shop = {field: shop.get(field) or '' for field in ('shop_name', 'shop_address', 'shop_phone', 'email')}
+        chunks = [missing[i:i + PDF_BATCH_CHUNK_SIZE] for i in range(0, len(missing), PDF_BATCH_CHUNK_SIZE)]
+        try:
+            if len(chunks) == 1:
+                results = [render_invoice_pdf_chunk(chunks[0], shop)]
+            else:
+                pool = get_pdf_pool()
+                results = list(pool.map(render_invoice_pdf_chunk, chunks, [shop] * len(chunks)))
+        except BrokenProcessPool:
+            with _pdf_pool_lock:
+                _pdf_pool = None
+            print("PDF process pool broke, rendering batch in-process")
+            results = [render_invoice_pdf_chunk(chunk, shop) for chunk in chunks]
+        
+        by_id = {invoice['invoice_id']: invoice for invoice in missing}
+        for chunk_result in results:
+            for invoice_id, pdf_bytes in chunk_result:
+                rendered[invoice_id] = pdf_bytes
+                pdf_cache.set(pdf_cache_key(by_id[invoice_id], shop), pdf_bytes)
+    
+    return [(invoice['invoice_id'], rendered[invoice['invoice_id']]) for invoice in invoices]
+
+def merge_invoice_pdfs(invoice_pdfs):
+    """Concatenate [(invoice_id, pdf bytes)] into one PDF, each invoice starting on a new page"""
+    from pypdf import PdfWriter  # Deferred like reportlab; only batch printing needs it
+    writer = PdfWriter()
+    for _, pdf_bytes in invoice_pdfs:
+        writer.append(BytesIO(pdf_bytes))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def build_invoice_zip(invoice_pdfs):
+    """Pack [(invoice_id, pdf bytes)] into a ZIP archive"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for invoice_id, pdf_bytes in invoice_pdfs:
+            archive.writestr(f"invoice_{invoice_id}.pdf", pdf_bytes)
+    return buffer.getvalue()
+
+def build_batch_pdf(user_email, shop, params):
+    """Render the invoices selected by params (from, to, format) for batch printing.
+    
+    Returns (file bytes, download name, mimetype). Raises ValueError for bad
+    parameters and NotFoundError when no invoices match.
+    """
+    export_format = (params.get('format') or 'pdf').lower()
+    if export_format not in ('pdf', 'zip'):
+        raise ValueError("format must be 'pdf' or 'zip'")
+    
+    query = {"user_email": user_email}
+    try:
+        date_range = {}
+        if params.get('from'):
+            date_range["$gte"] = parse_export_date(params['from'])
+        if params.get('to'):
+            date_range["$lt"] = parse_export_date(params['to'], end_of_range=True)
+        if date_range:
+            query["order_date"] = date_range
+    except ValueError:
+        raise ValueError("Dates must be in ISO format (YYYY-MM-DD)")
+    
+    invoices = list(invoices_collection.find(query).sort("invoice_id", 1).limit(PDF_BATCH_MAX_INVOICES + 1))
+    if not invoices:
+        raise NotFoundError("No invoices found in this date range")
+    if len(invoices) > PDF_BATCH_MAX_INVOICES:
+        raise ValueError(f"Too many invoices (more than {PDF_BATCH_MAX_INVOICES}). Please choose a smaller date range.")
+    
+    # Both formats render per invoice in the process pool (and reuse cached PDFs)
+    invoice_pdfs = render_invoice_pdfs(invoices, shop)
+    if export_format == 'zip':
+        return build_invoice_zip(invoice_pdfs), "invoices.zip", 'application/zip'
+    return merge_invoice_pdfs(invoice_pdfs), "invoices.pdf", 'application/pdf'
+
+@bp.route('/api/invoices/batch-pdf', methods=['GET'])
+@require_auth
+def batch_invoice_pdf():
+    """Print many invoices at once - Requires authentication
+    
+    Query parameters:
+      from, to - order_date range (ISO dates, 'to' includes that whole day)
+      format   - 'pdf' for one combined document (default) or 'zip' for one PDF per invoice
+      async    - '1' to queue the work as a background job
+    """
+    try:
+        if wants_async():
+            return queued_job_response('batch_pdf', job_params_from_request())
+        
+        try:
+            file_bytes, download_name, mimetype = build_batch_pdf(request.user_email, request.auth_doc, request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except NotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        
+        return send_file(BytesIO(file_bytes), as_attachment=True,
+                         download_name=download_name, mimetype=mimetype)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def load_invoice_pdf(user_email, shop, invoice_id):
+    """Return (cache key, PDF bytes) for one invoice, rendering it on a cache miss"""
+    invoice = invoices_collection.find_one({"invoice_id": invoice_id, "user_email": user_email})
+    if not invoice:
+        raise NotFoundError("Invoice not found or access denied")
+    
+    # Invoices are immutable, so a rendered PDF can be reused until the shop details change
+    cache_key = pdf_cache_key(invoice, shop)
+    pdf_bytes = pdf_cache.get(cache_key)
+    if pdf_bytes is None:
+        pdf_bytes = render_invoice_pdf(invoice, shop)
+        pdf_cache.set(cache_key, pdf_bytes)
+    return cache_key, pdf_bytes
+
+@bp.route('/api/invoices/<int:invoice_id>/pdf', methods=['GET'])
 @require_auth
 def generate_invoice_pdf(invoice_id):
     """Generate PDF for invoice - Requires authentication"""
@@ -1353,183 +3450,643 @@ def generate_invoice_pdf(invoice_id):
         if not auth_doc:
             return jsonify({"success": False, "error": "Unauthorized"}), 401
         
-        # Get shop details from auth
-        shop_info = auth_collection.find_one({"session_token": session_token})
+        if wants_async():
+            return queued_job_response('invoice_pdf', {"invoice_id": invoice_id})
         
-        # Default values if not found
-        shop_name = shop_info.get('shop_name', "SHOP") if shop_info else "SHOP"
-        shop_address = shop_info.get('shop_address', "") if shop_info else ""
-        shop_phone = shop_info.get('shop_phone', "") if shop_info else ""
-        owner_email = shop_info.get('email', "") if shop_info else ""
-        
-        # Check invoice exists and belongs to user
-        invoice = invoices_collection.find_one({"invoice_id": invoice_id, "user_email": owner_email})
-        if not invoice:
-            return jsonify({"success": False, "error": "Invoice not found or access denied"}), 404
-        
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
-        temp_filename = temp_file.name
-        temp_file.close()
-        
-        # Generate PDF
-        c = canvas.Canvas(temp_filename, pagesize=letter)
-        
-        # Shop Info Header with dynamic shop name
-        c.setFont("Helvetica-Bold", 20)
-        c.setFillColor(colors.HexColor("#138808"))
-        c.drawString(50, 750, shop_name.upper())
-        c.setFont("Helvetica-Bold", 12)
-        c.setFillColor(colors.black)
-        c.drawString(470, 750, invoice['order_date'].strftime("%d/%m/%Y"))
-        c.line(50, 740, 550, 740)
-        
-        c.setFont("Helvetica", 10)
-        c.drawString(50, 725, f"Address: {shop_address}")
-        c.drawString(50, 710, f"Phone: {shop_phone}")
-        c.drawString(50, 695, f"Email: {owner_email}")
-        
-        # Invoice ID
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(400, 665, f"Invoice ID: {invoice['invoice_id']}")
-        
-        # Customer Info
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, 650, f"To: {invoice['customer_name']}")
-        c.drawString(50, 635, f"Address: {invoice['customer_address']}")
-        c.drawString(50, 620, f"Contact: {invoice['customer_number']}")
-        
-        # Items table
-        y = 580
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(50, y, "Item")
-        c.drawString(200, y, "Quantity")
-        c.drawString(280, y, "Price (Rs)")
-        c.drawString(370, y, "Total (Rs)")
-        c.line(50, y-5, 420, y-5)
-        
-        y -= 20
-        c.setFont("Helvetica", 10)
-        for item in invoice['items']:
-            c.drawString(50, y, item["name"])
-            c.drawString(200, y, str(item["quantity"]))
-            c.drawString(280, y, f"Rs {item['price']:.2f}")
-            c.drawString(370, y, f"Rs {item['quantity'] * item['price']:.2f}")
-            y -= 15
-        
-        # Totals
-        y -= 10
-        c.line(50, y, 420, y)
-        y -= 20
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(280, y, f"Subtotal: Rs {invoice['subtotal']:.2f}")
-        y -= 15
-        # Split tax evenly into CGST/SGST for display if applicable
-        half_tax = invoice['tax'] / 2
-        cgst_rate = (invoice.get('tax_rate', 0) / 2)
-        sgst_rate = cgst_rate
-        c.drawString(280, y, f"CGST ({cgst_rate:.2f}%): Rs {half_tax:.2f}")
-        y -= 15
-        c.drawString(280, y, f"SGST ({sgst_rate:.2f}%): Rs {half_tax:.2f}")
-        y -= 15
-        c.drawString(280, y, f"Discount ({invoice.get('discount_rate', 0):.2f}%): -Rs {invoice['discount']:.2f}")
-        y -= 15
-        c.line(280, y, 420, y)
-        y -= 15
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(280, y, f"Total Amount: Rs {invoice['total']:.2f}")
-        
-        # Footer with branding
-        c.setFont("Helvetica", 8)
-        c.setFillColor(colors.grey)
-        c.drawString(50, 50, "Thank you for your business!")
-        
-        # Kandhal Invoice System branding at bottom center
-        c.setFont("Helvetica-Bold", 10)
-        c.setFillColor(colors.HexColor("#138808"))
-        footer_text = "Kandhal Invoice System"
-        text_width = c.stringWidth(footer_text, "Helvetica-Bold", 10)
-        c.drawString((letter[0] - text_width) / 2, 30, footer_text)
-        c.setFont("Helvetica", 7)
-        c.setFillColor(colors.grey)
-        powered_text = "Powered by Kandhal Technologies"
-        powered_width = c.stringWidth(powered_text, "Helvetica", 7)
-        c.drawString((letter[0] - powered_width) / 2, 20, powered_text)
-        
-        c.save()
+        # Shop details come from the (cached) auth document
+        try:
+            cache_key, pdf_bytes = load_invoice_pdf(auth_doc.get('email', ""), auth_doc, invoice_id)
+        except NotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
         
-        return send_file(temp_filename, as_attachment=True, 
+        return send_file(BytesIO(pdf_bytes), as_attachment=True, 
                         download_name=f"invoice_{invoice_id}.pdf", 
-                        mimetype='application/pdf')
+                        mimetype='application/pdf',
+                        etag=cache_key)
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/stats', methods=['GET'])
+# Sales rollups kept up to date by save_invoice so /api/stats never scans invoices:
+# daily_sales holds one document per shop per day plus a lifetime totals
+# document (day "all"), customer_sales one lifetime document per customer
+SALES_ROLLUP_TOTAL_DAY = "all"
+SALES_ROLLUP_TOTALS = ("revenue", "invoices", "subtotal", "tax", "discount")
+SALES_ROLLUP_FIELDS = {"customer_name": 1, "total": 1, "subtotal": 1, "tax": 1, "discount": 1, "items": 1, "order_date": 1}
+# Invoices older than this are assumed committed when a rebuild starts
+SALES_ROLLUP_REBUILD_MARGIN = timedelta(minutes=10)
+
+def sales_rollup_key(value):
+    """Map key for a customer or item name ('.' and '$' are not allowed in field names)"""
+    return hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:16]
+
+def sales_rollup_day(invoice):
+    return invoice['order_date'].strftime('%Y-%m-%d')
+
+def sales_rollup_update(invoice):
+    """$inc/$set update that adds one invoice to a daily_sales day document"""
+    total = invoice.get('total', 0)
+    customer_key = sales_rollup_key(invoice.get('customer_name', ''))
+    inc = {
+        "revenue": total,
+        "invoices": 1,
+        "subtotal": invoice.get('subtotal', 0),
+        "tax": invoice.get('tax', 0),
+        "discount": invoice.get('discount', 0),
+        f"customers.{customer_key}.total": total,
+        f"customers.{customer_key}.invoices": 1
+    }
+    names = {f"customers.{customer_key}.name": invoice.get('customer_name', '')}
+    for item in invoice.get('items', []):
+        item_key = item.get('item_id') or sales_rollup_key(item.get('name', ''))
+        quantity = item.get('quantity', 0)
+        for field, amount in (("quantity", quantity), ("revenue", quantity * item.get('price', 0))):
+            path = f"items.{item_key}.{field}"
+            inc[path] = inc.get(path, 0) + amount
+        names[f"items.{item_key}.name"] = item.get('name', '')
+    return {"$inc": inc, "$set": names}
+
+def sales_rollup_targets(invoice):
+    """(collection, key field, key, update) for every rollup document an invoice adds to.
+    
+    Only the day documents carry per-customer and per-item maps; lifetime
+    figures stay scalar so no document grows with the shop's history.
+    """
+    day_update = sales_rollup_update(invoice)
+    customer_name = invoice.get('customer_name', '')
+    return [
+        (daily_sales_collection, "day", sales_rollup_day(invoice), day_update),
+        (daily_sales_collection, "day", SALES_ROLLUP_TOTAL_DAY,
+         {"$inc": {field: day_update["$inc"][field] for field in SALES_ROLLUP_TOTALS}}),
+        (customer_sales_collection, "customer", sales_rollup_key(customer_name),
+         {"$inc": {"total": invoice.get('total', 0), "invoices": 1}, "$set": {"name": customer_name}}),
+    ]
+
+def increment_daily_sales(invoice, session=None):
+    """Add one invoice to its day's rollup, the shop's lifetime totals and its customer's totals"""
+    now = datetime.now()
+    user_email = invoice['user_email']
+    writes = {}
+    for collection, key_field, key, update in sales_rollup_targets(invoice):
+        update = {**update, "$set": {**update.get("$set", {}), "updated_at": now}}
+        writes.setdefault(collection, []).append(
+            UpdateOne({"user_email": user_email, key_field: key}, update, upsert=True)
+        )
+    for collection, operations in writes.items():
+        collection.bulk_write(operations, ordered=False, session=session)
+
+def apply_sales_rollup_update(doc, update):
+    """Apply a rollup update to an in-memory rollup document"""
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            *parents, field = path.split('.')
+            target = doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[field] = target.get(field, 0) + value if operator == "$inc" else value
+
+def accumulate_sales_rollups(rollups, invoices):
+    """Add invoices to in-memory rollup documents keyed by (collection, key field, key)"""
+    for invoice in invoices:
+        for collection, key_field, key, update in sales_rollup_targets(invoice):
+            apply_sales_rollup_update(rollups.setdefault((collection, key_field, key), {key_field: key}), update)
+
+def write_sales_rollups(user_email, rollups, session=None):
+    """Replace a shop's rollup documents with rollups and drop any others; returns documents written"""
+    now = datetime.now()
+    grouped = {(daily_sales_collection, "day"): {}, (customer_sales_collection, "customer"): {}}
+    for (collection, key_field, key), doc in rollups.items():
+        grouped[(collection, key_field)][key] = doc
+    written = 0
+    for (collection, key_field), docs in grouped.items():
+        if docs:
+            collection.bulk_write([
+                ReplaceOne(
+                    {"user_email": user_email, key_field: key},
+                    {**doc, "user_email": user_email, "updated_at": now},
+                    upsert=True
+                )
+                for key, doc in docs.items()
+            ], ordered=False, session=session)
+        collection.delete_many({"user_email": user_email, key_field: {"$nin": list(docs)}}, session=session)
+        written += len(docs)
+    return written
+
+def rebuild_daily_sales(user_email=None):
+    """Recompute the sales rollups from invoices, optionally for one shop; returns documents written.
+    
+    Safe while invoices are being saved: invoices older than
+    SALES_ROLLUP_REBUILD_MARGIN are summed first, then the newer ones are
+    re-read and the rollups replaced in one transaction, so a concurrent
+    invoice is either in that snapshot or conflicts and is retried after it.
+    Servers without transactions can still miss an invoice saved during the
+    final write.
+    """
+    shops = [user_email] if user_email else invoices_collection.distinct("user_email")
+    written = 0
+    for shop_email in shops:
+        high_water = datetime.now() - SALES_ROLLUP_REBUILD_MARGIN
+        settled = {}
+        accumulate_sales_rollups(settled, invoices_collection.find(
+            {"user_email": shop_email, "order_date": {"$type": "date", "$lt": high_water}},
+            SALES_ROLLUP_FIELDS
+        ).batch_size(1000))
+        
+        def replace_rollups(session=None):
+            rollups = {key: copy.deepcopy(doc) for key, doc in settled.items()}
+            accumulate_sales_rollups(rollups, invoices_collection.find(
+                {"user_email": shop_email, "order_date": {"$gte": high_water}},
+                SALES_ROLLUP_FIELDS, session=session
+            ))
+            return write_sales_rollups(shop_email, rollups, session=session)
+        
+        if supports_transactions():
+            with client.start_session() as session:
+                written += session.with_transaction(replace_rollups)
+        else:
+            written += replace_rollups()
+        stats_cache.invalidate(shop_email)
+    return written
+
+@bp.cli.command('rebuild-daily-sales')
+@click.option('--user-email', default=None, help='Only rebuild rollups of this shop')
+def rebuild_daily_sales_command(user_email):
+    """Backfill the sales rollups behind /api/stats from existing invoices"""
+    written = rebuild_daily_sales(user_email)
+    print(f"Rebuilt {written} sales rollups")
+
+STATS_TOP_CUSTOMERS = 5
+STATS_RECENT_DAYS = 7
+STATS_MAX_PERIODS = 400
+# $dateToString formats for the sales buckets of a reporting window (weeks are ISO weeks)
+STATS_GRANULARITIES = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+# Longest span of one bucket, for bounding the sales of a window without a start
+STATS_PERIOD_DAYS = {"day": 1, "week": 7, "month": 31}
+
+def parse_stats_window(params):
+    """Reporting window from the from/to/granularity parameters: (order_date range, granularity).
+    
+    Raises ValueError for bad parameters.
+    """
+    granularity = (params.get('granularity') or 'day').lower()
+    if granularity not in STATS_GRANULARITIES:
+        raise ValueError("granularity must be 'day', 'week' or 'month'")
+    try:
+        date_range = {}
+        if params.get('from'):
+            date_range["$gte"] = parse_export_date(params['from'])
+        if params.get('to'):
+            date_range["$lt"] = parse_export_date(params['to'], end_of_range=True)
+    except ValueError:
+        raise ValueError("Dates must be in ISO format (YYYY-MM-DD)")
+    return date_range, granularity
+
+def aggregate_stats(user_email, date_range=None, granularity='day', periods=STATS_MAX_PERIODS):
+    """Totals, top customers and sales per period for the invoices in a window, in one pass.
+    
+    The window match runs before the $facet so it is served by the
+    (user_email, order_date) index; sales keeps the most recent periods.
+    Without a start date, sales only groups the invoices that can fall in
+    those periods rather than the shop's whole history.
+    """
+    match = {"user_email": user_email}
+    if date_range:
+        match["order_date"] = date_range
+    sales_since = (date_range or {}).get("$gte")
+    if sales_since is None:
+        end = (date_range or {}).get("$lt") or datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+        sales_since = end - timedelta(days=periods * STATS_PERIOD_DAYS[granularity])
+    result = next(invoices_collection.aggregate([
+        {"$match": match},
+        {"$facet": {
+            "totals": [
+                {"$group": {"_id": None, "invoices": {"$sum": 1}, "revenue": {"$sum": "$total"}}}
+            ],
+            "top_customers": [
+                {"$group": {"_id": "$customer_name", "total_spent": {"$sum": "$total"}, "invoice_count": {"$sum": 1}}},
+                {"$sort": {"total_spent": -1}},
+                {"$limit": STATS_TOP_CUSTOMERS}
+            ],
+            "sales": [
+                {"$match": {"order_date": {"$gte": sales_since}}},
+                {"$group": {
+                    "_id": {"$dateToString": {"format": STATS_GRANULARITIES[granularity], "date": "$order_date"}},
+                    "sales": {"$sum": "$total"},
+                    "invoices": {"$sum": 1}
+                }},
+                {"$sort": {"_id": -1}},
+                {"$limit": periods}
+            ]
+        }}
+    ]))
+    totals = result['totals'][0] if result['totals'] else {}
+    return {
+        "total_invoices": totals.get('invoices', 0),
+        "total_revenue": totals.get('revenue', 0),
+        "top_customers": result['top_customers'],
+        "sales": result['sales']
+    }
+
+_sales_rollups_ready = False
+
+def sales_rollups_ready():
+    """Whether the migration that builds the sales rollups has been applied (checked until it has)"""
+    global _sales_rollups_ready
+    if not _sales_rollups_ready:
+        _sales_rollups_ready = migrations_collection.find_one({"_id": SALES_ROLLUP_MIGRATION}, {"_id": 1}) is not None
+    return _sales_rollups_ready
+
+def rollup_stats(user_email):
+    """Dashboard stats from the sales rollups; only complete once sales_rollups_ready()"""
+    totals = daily_sales_collection.find_one({"user_email": user_email, "day": SALES_ROLLUP_TOTAL_DAY}) or {}
+    top_customers = customer_sales_collection.find(
+        {"user_email": user_email},
+        {"name": 1, "total": 1, "invoices": 1}
+    ).sort("total", -1).limit(STATS_TOP_CUSTOMERS)
+    
+    # Daily sales for the last 7 days with sales
+    recent_days = daily_sales_collection.find(
+        {"user_email": user_email, "day": {"$ne": SALES_ROLLUP_TOTAL_DAY}},
+        {"day": 1, "revenue": 1}
+    ).sort("day", -1).limit(STATS_RECENT_DAYS)
+    
+    return {
+        "total_invoices": totals.get('invoices', 0),
+        "total_revenue": totals.get('revenue', 0),
+        "top_customers": [
+            {"_id": customer['name'], "total_spent": customer['total'], "invoice_count": customer['invoices']}
+            for customer in top_customers
+        ],
+        "daily_sales": [{"_id": day['day'], "daily_sales": day['revenue']} for day in recent_days]
+    }
+
+class StatsCache:
+    """Per-shop cache of serialized /api/stats responses.
+    
+    Keys include the shop's stats generation, which invalidate() bumps when an
+    invoice is saved, so a payload computed before the write is never served
+    after it. Without ``shared_dir`` generations are per process and
+    ``ttl_seconds`` bounds how long other gunicorn workers keep serving the
+    previous payload; with it, generation stamps and payloads are files that
+    every worker on the host reads.
+    """
+    
+    def __init__(self, max_bytes=4 * 1024 * 1024, ttl_seconds=60, shared_dir=None):
+        self.ttl_seconds = ttl_seconds
+        self.shared_dir = shared_dir
+        self._payloads = BinaryCache(max_bytes=max_bytes, disk_dir=shared_dir, suffix='.json')
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+    
+    def _stamp_path(self, user_email):
+        return os.path.join(self.shared_dir, f"{hashlib.sha256(user_email.encode('utf-8')).hexdigest()}.generation")
+    
+    def key(self, user_email, params):
+        """Cache key for a stats request; take it before computing so a concurrent invalidation wins"""
+        if self.shared_dir:
+            # The stamp alone, so every worker derives the same key for the same state
+            try:
+                with open(self._stamp_path(user_email)) as f:
+                    generation = f.read()
+            except OSError:
+                generation = ""
+        else:
+            with self._lock:
+                generation = str(self._generations.get(user_email, 0))
+        window = int(time.time() // self.ttl_seconds) if self.ttl_seconds > 0 else 0
+        raw = json.dumps([user_email, sorted(params.items()), generation, window])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        return self._payloads.get(key)
+    
+    def set(self, key, payload):
+        self._payloads.set(key, payload)
+    
+    def invalidate(self, user_email):
+        """Retire every cached stats payload of a shop"""
+        with self._lock:
+            self.invalidations += 1
+            if not self.shared_dir:
+                self._generations[user_email] = self._generations.get(user_email, 0) + 1
+                return
+        path = self._stamp_path(user_email)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(secrets.token_hex(8))
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Stats cache invalidation failed: {e}")
+    
+    def stats(self):
+        with self._lock:
+            invalidations = self.invalidations
+        return {**self._payloads.stats(), "ttl_seconds": self.ttl_seconds, "invalidations": invalidations}
+
+stats_cache = StatsCache(
+    max_bytes=int(os.getenv('STATS_CACHE_MB', 4)) * 1024 * 1024,
+    ttl_seconds=int(os.getenv('STATS_CACHE_TTL', 60)),
+    shared_dir=os.getenv('STATS_CACHE_DIR') or None
+)
+
+STATS_PARAMS = ('from', 'to', 'granularity')
+
+def compute_stats(user_email, params):
+    """Stats for the dashboard, or for the reporting window in params; raises ValueError for bad parameters"""
+    if not any(params.get(name) for name in STATS_PARAMS):
+        if sales_rollups_ready():
+            stats = rollup_stats(user_email)
+        else:
+            # Invoices saved since deploy are in the rollups, older ones only after the
+            # migration: until then, one pass over the invoices instead
+            stats = aggregate_stats(user_email, periods=STATS_RECENT_DAYS)
+            stats["daily_sales"] = [
+                {"_id": period['_id'], "daily_sales": period['sales']} for period in stats.pop('sales')
+            ]
+        return stats
+    
+    date_range, granularity = parse_stats_window(params)
+    stats = aggregate_stats(user_email, date_range, granularity)
+    stats.update({"granularity": granularity, "from": params.get('from'), "to": params.get('to')})
+    return stats
+
+@bp.route('/api/stats', methods=['GET'])
 @require_auth
 def get_stats():
-    """Get sales statistics - Requires authentication"""
+    """Get sales statistics - Requires authentication
+    
+    Without parameters returns the dashboard summary. from/to (ISO dates) and
+    granularity (day, week or month) select a reporting window whose sales
+    are returned per period. Responses carry an ETag; a matching
+    If-None-Match gets 304 Not Modified.
+    """
     try:
         user_email = request.user_email
+        params = {name: request.args.get(name) for name in STATS_PARAMS if request.args.get(name)}
         
-        # Filter by user_email
-        total_invoices = invoices_collection.count_documents({"user_email": user_email})
-        total_revenue = list(invoices_collection.aggregate([
-            {"$match": {"user_email": user_email}},
-            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-        ]))
-        
-        # Top customers for this user
-        top_customers = list(invoices_collection.aggregate([
-            {"$match": {"user_email": user_email}},
-            {"$group": {"_id": "$customer_name", "total_spent": {"$sum": "$total"}, "invoice_count": {"$sum": 1}}},
-            {"$sort": {"total_spent": -1}},
-            {"$limit": 5}
-        ]))
-        
-        # Daily sales for the last 7 days for this user
-        daily_sales = list(invoices_collection.aggregate([
-            {"$match": {"user_email": user_email}},
-            {
-                "$group": {
-                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$order_date"}},
-                    "daily_sales": {"$sum": "$total"}
-                }
-            },
-            {"$sort": {"_id": -1}},
-            {"$limit": 7}
-        ]))
-        
+        cache_key = stats_cache.key(user_email, params)
+        payload = stats_cache.get(cache_key)
+        if payload is None:
+            try:
+                stats = compute_stats(user_email, params)
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            payload = json.dumps({"success": True, "stats": stats}, sort_keys=True, default=str).encode('utf-8')
+            stats_cache.set(cache_key, payload)
+        
+        response = Response(payload, mimetype='application/json')
+        response.set_etag(hashlib.sha256(payload).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+ITEM_ANALYTICS_DEFAULT_DAYS = 30
+ITEM_ANALYTICS_MAX_DAYS = 366
+ITEM_ANALYTICS_SORTS = ("units", "revenue", "velocity", "days_of_stock")
+# Stock lasting longer than this is reported without a projection (dates past it overflow quickly)
+ITEM_STOCKOUT_HORIZON_DAYS = 3650
+
+def parse_analytics_window(params):
+    """(first day, last day) of an item analytics window, both inclusive; raises ValueError for bad parameters"""
+    try:
+        last_day = date.fromisoformat(params['to'][:10]) if params.get('to') else date.today()
+        if params.get('from'):
+            first_day = date.fromisoformat(params['from'][:10])
+        else:
+            first_day = last_day - timedelta(days=int(params.get('days') or ITEM_ANALYTICS_DEFAULT_DAYS) - 1)
+    except ValueError:
+        raise ValueError("Dates must be in ISO format (YYYY-MM-DD) and days a whole number")
+    if first_day > last_day:
+        raise ValueError("from must not be after to")
+    if (last_day - first_day).days + 1 > ITEM_ANALYTICS_MAX_DAYS:
+        raise ValueError(f"Window is limited to {ITEM_ANALYTICS_MAX_DAYS} days")
+    return first_day, last_day
+
+def item_sales_analytics(user_email, first_day, last_day, sort='units', limit=50):
+    """Units sold, revenue and velocity per item over a window, with days of stock remaining.
+    
+    Reads the per-item totals of the window's daily_sales rollups (one small
+    document per day with sales) into items x days matrices and computes
+    every metric column-wise, so the cost grows with items sold, not with
+    invoices. Only items sold in the window are reported.
+    """
+    import numpy as np  # Deferred to the first analytics request to keep worker boot fast
+    
+    days = (last_day - first_day).days + 1
+    rollups = list(daily_sales_collection.find(
+        {"user_email": user_email, "day": {"$gte": first_day.isoformat(), "$lte": last_day.isoformat()}},
+        {"day": 1, "items": 1}
+    ))
+    
+    rows, names = {}, []
+    for rollup in rollups:
+        for item_key, totals in rollup.get('items', {}).items():
+            if item_key not in rows:
+                rows[item_key] = len(names)
+                names.append(totals.get('name', ''))
+    units = np.zeros((len(names), days))
+    revenue = np.zeros((len(names), days))
+    for rollup in rollups:
+        column = (date.fromisoformat(rollup['day']) - first_day).days
+        for item_key, totals in rollup.get('items', {}).items():
+            units[rows[item_key], column] = totals.get('quantity', 0)
+            revenue[rows[item_key], column] = totals.get('revenue', 0)
+    
+    item_keys = list(rows)
+    object_ids = [ObjectId(key) for key in item_keys if ObjectId.is_valid(key)]
+    current = {
+        str(item['_id']): item
+        for item in items_collection.find({"_id": {"$in": object_ids}, "user_email": user_email}, {"item_name": 1, "stock": 1})
+    }
+    # Items deleted since (or sold before item IDs were recorded) have no stock to project
+    stock = np.array([current.get(key, {}).get('stock', np.nan) for key in item_keys], dtype=float)
+    
+    units_sold = units.sum(axis=1)
+    velocity = units_sold / days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_stock = np.where(velocity > 0, stock / velocity, np.inf)
+        sell_through = units_sold / (units_sold + stock)
+    metrics = {
+        "units": -units_sold,
+        "revenue": -revenue.sum(axis=1),
+        "velocity": -velocity,
+        "days_of_stock": np.nan_to_num(days_of_stock, nan=np.inf)
+    }
+    order = np.argsort(metrics[sort], kind='stable')[:limit]
+    
+    today = date.today()
+    horizon = min(ITEM_STOCKOUT_HORIZON_DAYS, (date.max - today).days)
+    report = []
+    for row in order:
+        item_key = item_keys[row]
+        remaining = days_of_stock[row]
+        known = bool(np.isfinite(remaining)) and remaining <= horizon
+        report.append({
+            "item_id": item_key if item_key in current else None,
+            "item_name": current.get(item_key, {}).get('item_name') or names[row],
+            "units_sold": float(units_sold[row]),
+            "revenue": round(float(revenue[row].sum()), 2),
+            "days_with_sales": int(np.count_nonzero(units[row])),
+            "velocity_per_day": round(float(velocity[row]), 3),
+            "sell_through": round(float(sell_through[row]), 4) if np.isfinite(sell_through[row]) else None,
+            "stock": None if np.isnan(stock[row]) else float(stock[row]),
+            "days_of_stock": round(float(remaining), 1) if known else None,
+            "projected_stockout": (today + timedelta(days=int(remaining))).isoformat() if known else None
+        })
+    return {"items_sold": len(item_keys), "items": report}
+
+@bp.route('/api/analytics/items', methods=['GET'])
+@require_auth
+def get_item_analytics():
+    """Per-item sales, velocity and days of stock remaining over a window - Requires authentication"""
+    try:
+        params = request.args
+        try:
+            first_day, last_day = parse_analytics_window(params)
+            sort = (params.get('sort') or 'units').lower()
+            if sort not in ITEM_ANALYTICS_SORTS:
+                raise ValueError(f"sort must be one of: {', '.join(ITEM_ANALYTICS_SORTS)}")
+            limit = min(max(int(params.get('limit') or 50), 1), 500)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        analytics = item_sales_analytics(request.user_email, first_day, last_day, sort, limit)
         return jsonify({
             "success": True,
-            "stats": {
-                "total_invoices": total_invoices,
-                "total_revenue": total_revenue[0]['total'] if total_revenue else 0,
-                "top_customers": top_customers,
-                "daily_sales": daily_sales
-            }
+            "window": {
+                "from": first_day.isoformat(),
+                "to": last_day.isoformat(),
+                "days": (last_day - first_day).days + 1
+            },
+            **analytics
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/export/all-data', methods=['GET'])
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def gzip_stream(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode('utf-8'))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def chunked(parts, chunk_size=EXPORT_CHUNK_SIZE):
+    """Join a stream of small text parts into chunks of roughly chunk_size"""
+    buffer = []
+    buffered = 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def encode_stream(parts, compress=False):
+    """Turn a stream of text parts into ~EXPORT_CHUNK_SIZE byte chunks, optionally gzipped"""
+    chunks = chunked(parts)
+    if compress:
+        return gzip_stream(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
+
+def streamed_response(parts, mimetype, compress=False, headers=None):
+    """Stream text parts as a chunked response, optionally gzip-compressed"""
+    response = Response(encode_stream(parts, compress), mimetype=mimetype, headers=headers)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def stream_export_json(user_email, shop_info):
+    """Yield the export document incrementally from MongoDB cursors.
+    
+    The summary is accumulated while documents stream past, so it is written last.
+    """
+    summary = {
+        "total_items": 0,
+        "total_stock_value": 0,
+        "total_customers": 0,
+        "total_invoices": 0,
+        "total_revenue": 0
+    }
+    
+    def count_item(item):
+        summary["total_items"] += 1
+        summary["total_stock_value"] += item.get('item_price', 0) * item.get('stock', 0)
+    
+    def count_customer(customer):
+        summary["total_customers"] += 1
+    
+    def count_invoice(invoice):
+        summary["total_invoices"] += 1
+        summary["total_revenue"] += invoice.get('total', 0)
+    
+    sections = [
+        ("items", items_collection, ITEM_PROJECTION, count_item),
+        ("customers", customers_collection, None, count_customer),
+        ("invoices", invoices_collection, None, count_invoice)
+    ]
+    
+    yield '{"success": true, "data": {"shop_info": ' + json.dumps(shop_info)
+    for name, collection, projection, accumulate in sections:
+        yield f', "{name}": ['
+        separator = ''
+        for doc in collection.find({"user_email": user_email}, projection).batch_size(500):
+            accumulate(doc)
+            yield separator + json.dumps(serialize_doc(doc), default=str)
+            separator = ', '
+        yield ']'
+    
+    summary["total_stock_value"] = round(summary["total_stock_value"], 2)
+    summary["total_revenue"] = round(summary["total_revenue"], 2)
+    yield ', "summary": ' + json.dumps(summary) + '}}'
+
+def export_shop_info(user_email):
+    """Shop block written at the top of a full export"""
+    user_session = auth_collection.find_one({"email": user_email})
+    return {
+        "shop_name": user_session.get("shop_name", "Unknown Shop") if user_session else "Unknown Shop",
+        "shop_address": user_session.get("shop_address", "") if user_session else "",
+        "shop_phone": user_session.get("shop_phone", "") if user_session else "",
+        "export_date": datetime.now().isoformat()
+    }
+
+@bp.route('/api/export/all-data', methods=['GET'])
 @require_auth
 def export_all_data():
-    """Export all shop data (items, customers, invoices) as JSON - Requires authentication"""
+    """Export all shop data (items, customers, invoices) as JSON - Requires authentication
+    
+    ?stream=1 streams the document from database cursors in constant memory,
+    and ?gzip=1 additionally compresses the stream on the fly. ?async=1 queues
+    the export as a background job instead.
+    """
     try:
         user_email = request.user_email
         
+        if wants_async():
+            return queued_job_response('export_all', job_params_from_request())
+        
         # Get user's shop information
-        user_session = auth_collection.find_one({"email": user_email})
-        shop_info = {
-            "shop_name": user_session.get("shop_name", "Unknown Shop") if user_session else "Unknown Shop",
-            "shop_address": user_session.get("shop_address", "") if user_session else "",
-            "shop_phone": user_session.get("shop_phone", "") if user_session else "",
-            "export_date": datetime.now().isoformat()
-        }
+        shop_info = export_shop_info(user_email)
+        
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            return streamed_response(
+                stream_export_json(user_email, shop_info),
+                'application/json',
+                compress=request.args.get('gzip', '').lower() in ('1', 'true')
+            )
         
         # Get all items for this user
-        items = list(items_collection.find({"user_email": user_email}))
+        items = list(items_collection.find({"user_email": user_email}, ITEM_PROJECTION))
         serialized_items = [serialize_doc(item) for item in items]
         
         # Get all customers for this user
@@ -1568,7 +4125,667 @@ def export_all_data():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/')
+# Incremental exports: collection -> (mongo collection, date field for from/to, sort key, CSV columns)
+EXPORT_COLLECTIONS = {
+    "invoices": (invoices_collection, "order_date", "invoice_id", [
+        "invoice_id", "order_date", "customer_name", "customer_number", "customer_email",
+        "customer_address", "payment_method", "subtotal", "tax_rate", "tax",
+        "discount_rate", "discount", "total", "notes", "items", "created_at", "updated_at"
+    ]),
+    "items": (items_collection, "created_at", "_id", [
+        "_id", "item_name", "item_price", "stock", "unit", "created_at", "updated_at"
+    ]),
+    "customers": (customers_collection, "created_at", "_id", [
+        "_id", "customer_name", "customer_phone", "customer_email", "customer_address",
+        "total_purchases", "total_spent", "created_at", "updated_at"
+    ])
+}
+
+def parse_export_date(value, end_of_range=False):
+    """Parse an ISO date/datetime query parameter into a naive local datetime.
+    
+    A bare date used as the end of a range covers that whole day.
+    """
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    if value is None:
+        return ''
+    return value
+
+def stream_csv(cursor, columns):
+    """Yield CSV text for the cursor, one line per document"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for doc in cursor:
+        doc = serialize_doc(doc)
+        writer.writerow([csv_value(doc.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_ndjson(cursor):
+    """Yield one JSON document per line"""
+    for doc in cursor:
+        yield json.dumps(serialize_doc(doc), default=str) + '\n'
+
+# Rows are stamped with updated_at when a request builds them, before the write
+# commits; the watermark trails by this much so a slow write is never skipped
+EXPORT_WATERMARK_LAG = timedelta(minutes=5)
+
+def build_collection_export(user_email, collection_name, params):
+    """Prepare an incremental export of one collection.
+    
+    Returns (text parts, mimetype, file name, watermark). Rows changed within
+    EXPORT_WATERMARK_LAG before the export appear again in the next since=
+    export, so consumers should upsert by _id. Deletes are not exported.
+    Raises NotFoundError for an unknown collection and ValueError for bad
+    parameters.
+    """
+    if collection_name not in EXPORT_COLLECTIONS:
+        raise NotFoundError(f"Unknown export: {collection_name}")
+    collection, date_field, sort_key, columns = EXPORT_COLLECTIONS[collection_name]
+    
+    export_format = (params.get('format') or 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        raise ValueError("format must be 'ndjson' or 'csv'")
+    
+    # Taken before querying so rows written during the export are picked up next time
+    watermark = datetime.now() - EXPORT_WATERMARK_LAG
+    query = {"user_email": user_email}
+    try:
+        date_range = {}
+        if params.get('from'):
+            date_range["$gte"] = parse_export_date(params['from'])
+        if params.get('to'):
+            date_range["$lt"] = parse_export_date(params['to'], end_of_range=True)
+        if date_range:
+            query[date_field] = date_range
+        if params.get('since'):
+            since = parse_export_date(params['since'])
+            # Rows written before updated_at was tracked fall back to created_at
+            query["$or"] = [
+                {"updated_at": {"$gte": since}},
+                {"updated_at": {"$exists": False}, "created_at": {"$gte": since}}
+            ]
+    except ValueError:
+        raise ValueError("Dates must be in ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)")
+    
+    projection = ITEM_PROJECTION if collection_name == 'items' else None
+    cursor = collection.find(query, projection).sort(sort_key, 1).batch_size(500)
+    filename = f"{collection_name}.{export_format}"
+    if export_format == 'csv':
+        return stream_csv(cursor, columns), 'text/csv', filename, watermark
+    return stream_ndjson(cursor), 'application/x-ndjson', filename, watermark
+
+@bp.route('/api/export/<collection_name>', methods=['GET'])
+@require_auth
+def export_collection(collection_name):
+    """Stream invoices, items or customers as NDJSON or CSV - Requires authentication
+    
+    Query parameters:
+      format - 'ndjson' (default) or 'csv'
+      from   - earliest order_date (invoices) / created_at (items, customers), ISO format
+      to     - latest order_date / created_at; a bare date includes that whole day
+      since  - only rows changed at or after this time (use the previous X-Export-Watermark;
+               rows near it may be sent twice, deleted rows are not reported)
+      gzip   - '1' to gzip the stream
+      async  - '1' to queue the export as a background job
+    """
+    try:
+        if wants_async():
+            return queued_job_response('export_collection', dict(job_params_from_request(), collection=collection_name))
+        
+        try:
+            parts, mimetype, filename, watermark = build_collection_export(
+                request.user_email, collection_name, request.args
+            )
+        except NotFoundError as e:
+            return jsonify({"success": False, "error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        headers = {
+            "X-Export-Watermark": watermark.isoformat(),
+            "Content-Disposition": f"attachment; filename={filename}"
+        }
+        compress = request.args.get('gzip', '').lower() in ('1', 'true')
+        return streamed_response(parts, mimetype, compress, headers)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+def decode_import_lines(stream, bad_lines):
+    """Decode an upload line by line, appending the numbers of lines that are not UTF-8 to bad_lines"""
+    for line_number, raw in enumerate(stream, start=1):
+        if line_number == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            yield raw.decode('utf-8')
+        except UnicodeDecodeError:
+            bad_lines.append(line_number)
+            yield raw.decode('utf-8', errors='replace')
+
+def iter_import_rows(stream, import_format):
+    """Stream-parse an uploaded CSV or NDJSON file, yielding (line number, row dict or None, error).
+    
+    Raises ValueError when a CSV header is not valid UTF-8; any other line
+    that is not is reported as a failed row.
+    """
+    bad_lines = []
+    lines = decode_import_lines(stream, bad_lines)
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is not None and bad_lines:
+            raise ValueError("The CSV header is not valid UTF-8 text")
+        for row in reader:
+            if bad_lines:
+                bad_lines.clear()
+                yield reader.line_num, None, "Not valid UTF-8 text"
+                continue
+            yield reader.line_num, row, None
+        return
+    
+    for line_number, line in enumerate(lines, start=1):
+        if bad_lines:
+            bad_lines.clear()
+            yield line_number, None, "Not valid UTF-8 text"
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, row, None
+
+def run_bulk_import(rows, collection, build_operation, after_batch=None):
+    """Validate rows and apply them with batched unordered bulk_write calls.
+    
+    build_operation(row) returns (operation, None) or (None, error message).
+    after_batch(rows) is called with the validated rows of each written batch.
+    Returns a report with counts and per-line errors.
+    """
+    report = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    
+    def record_error(line, error):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": line, "error": error})
+    
+    def flush(operations, batch):
+        try:
+            result = collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for write_error in result.get('writeErrors', []):
+                record_error(batch[write_error['index']][0], write_error.get('errmsg', 'Write failed'))
+        report["inserted"] += result.get('nUpserted', 0) + result.get('nInserted', 0)
+        report["updated"] += result.get('nMatched', 0)
+        if after_batch:
+            after_batch([row for _, row in batch])
+    
+    operations = []
+    batch = []
+    for line, row, error in rows:
+        report["processed"] += 1
+        if not error:
+            operation, error = build_operation(row)
+        if error:
+            record_error(line, error)
+            continue
+        operations.append(operation)
+        batch.append((line, row))
+        if len(operations) >= IMPORT_BATCH_SIZE:
+            flush(operations, batch)
+            operations = []
+            batch = []
+    if operations:
+        flush(operations, batch)
+    
+    report["errors_truncated"] = report["failed"] > len(report["errors"])
+    return report
+
+def import_upload():
+    """Return (stream, format) for the uploaded import file or raise ValueError"""
+    upload = request.files.get('file')
+    if upload:
+        stream, filename = upload.stream, upload.filename or ''
+    else:
+        stream, filename = request.stream, ''
+    
+    import_format = request.args.get('format', '').lower()
+    if not import_format:
+        if filename.lower().endswith('.csv') or request.mimetype == 'text/csv':
+            import_format = 'csv'
+        else:
+            import_format = 'ndjson'
+    if import_format not in ('csv', 'ndjson'):
+        raise ValueError("format must be 'csv' or 'ndjson'")
+    return stream, import_format
+
+@bp.route('/api/import/items', methods=['POST'])
+@require_auth
+def import_items():
+    """Bulk import items from a CSV or NDJSON upload - Requires authentication
+    
+    Rows follow POST /api/items: existing items (same name) get their stock
+    increased and unit updated, new items are created.
+    """
+    try:
+        try:
+            stream, import_format = import_upload()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        user_email = request.user_email
+        now = datetime.now()
+        reorder_levels = []
+        known_names = set()
+        
+        def build_operation(row):
+            fields, error = validate_item_fields(row, require_price=False)
+            if error:
+                return None, error
+            item_name = fields['item_name']
+            # A row without a price only tops up an item that exists (or an earlier row creates)
+            if fields['item_price'] is None and item_name not in known_names:
+                if not items_collection.find_one({"item_name": item_name, "user_email": user_email}, {"_id": 1}):
+                    return None, "Item price is required"
+            known_names.add(item_name)
+            changes = {"unit": fields['unit'], "updated_at": now}
+            if fields['reorder_level'] is not None:
+                changes["reorder_level"] = fields['reorder_level']
+                reorder_levels.append(fields['reorder_level'])
+            update = {"$inc": {"stock": fields['stock']}, "$set": changes}
+            if fields['item_price'] is None:
+                return UpdateOne({"item_name": item_name, "user_email": user_email}, update), None
+            update["$setOnInsert"] = {
+                "name_lc": normalize_item_name(item_name),
+                "item_price": fields['item_price'],
+                "created_at": now
+            }
+            return UpdateOne({"item_name": item_name, "user_email": user_email}, update, upsert=True), None
+        
+        report = run_bulk_import(iter_import_rows(stream, import_format), items_collection, build_operation)
+        item_catalog.invalidate(user_email)
+        if reorder_levels:
+            note_reorder_level(user_email, max(reorder_levels))
+        return jsonify({"success": True, **report})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+@bp.route('/api/import/customers', methods=['POST'])
+@require_auth
+def import_customers():
+    """Bulk import customers from a CSV or NDJSON upload - Requires authentication
+    
+    Rows are matched on normalised phone number: existing customers get their
+    name, email and address updated, new customers are created.
+    """
+    try:
+        try:
+            stream, import_format = import_upload()
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        user_email = request.user_email
+        now = datetime.now()
+        
+        def build_operation(row):
+            fields, error = validate_customer_fields(row)
+            if error:
+                return None, error
+            lookup_keys = customer_lookup_keys(fields['customer_phone'], fields['customer_email'])
+            row['phone_e164'] = lookup_keys['phone_e164']
+            return UpdateOne(
+                {"phone_e164": lookup_keys['phone_e164'], "user_email": user_email},
+                {
+                    "$set": {
+                        "customer_name": fields['customer_name'],
+                        "customer_email": fields['customer_email'],
+                        "email_lc": lookup_keys['email_lc'],
+                        "customer_address": fields['customer_address'],
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {
+                        "customer_phone": fields['customer_phone'],
+                        "total_purchases": 0,
+                        "total_spent": 0,
+                        "created_at": now
+                    }
+                },
+                upsert=True
+            ), None
+        
+        def refresh_batch_totals(rows):
+            # Imported customers may already have invoices under their phone/email
+            customers = list(customers_collection.find(
+                {"user_email": user_email, "phone_e164": {"$in": [row['phone_e164'] for row in rows]}},
+                {"customer_email": 1, "customer_phone": 1, "phone_e164": 1}
+            ))
+            if customers:
+                _write_customer_totals(customers, user_email)
+        
+        report = run_bulk_import(
+            iter_import_rows(stream, import_format), customers_collection,
+            build_operation, after_batch=refresh_batch_totals
+        )
+        return jsonify({"success": True, **report})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+# Background jobs: heavy work queued in the jobs collection and run by worker threads
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+JOB_TIMEOUT_MINUTES = 30
+JOB_MAX_ATTEMPTS = 3
+JOB_RESULT_HOURS = 24
+JOB_CLEANUP_SECONDS = 300
+
+def run_invoice_pdf_job(user_email, shop, params):
+    try:
+        invoice_id = int(params.get('invoice_id', 0))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid invoice ID")
+    _, pdf_bytes = load_invoice_pdf(user_email, shop, invoice_id)
+    return [pdf_bytes], f"invoice_{invoice_id}.pdf", 'application/pdf'
+
+def run_batch_pdf_job(user_email, shop, params):
+    file_bytes, download_name, mimetype = build_batch_pdf(user_email, shop, params)
+    return [file_bytes], download_name, mimetype
+
+def run_qr_labels_job(user_email, shop, params):
+    pdf_bytes, download_name, mimetype = build_qr_label_sheet(user_email, params)
+    return [pdf_bytes], download_name, mimetype
+
+def run_export_all_job(user_email, shop, params):
+    compress = str(params.get('gzip', '')).lower() in ('1', 'true')
+    chunks = encode_stream(stream_export_json(user_email, export_shop_info(user_email)), compress)
+    if compress:
+        return chunks, "export.json.gz", 'application/gzip'
+    return chunks, "export.json", 'application/json'
+
+def run_export_collection_job(user_email, shop, params):
+    parts, mimetype, filename, _ = build_collection_export(user_email, params.get('collection', ''), params)
+    if str(params.get('gzip', '')).lower() in ('1', 'true'):
+        return encode_stream(parts, True), f"{filename}.gz", 'application/gzip'
+    return encode_stream(parts), filename, mimetype
+
+# Job type -> handler(user_email, shop auth document, params) returning (byte chunks, file name, mimetype)
+JOB_TYPES = {
+    "invoice_pdf": run_invoice_pdf_job,
+    "batch_pdf": run_batch_pdf_job,
+    "qr_labels": run_qr_labels_job,
+    "export_all": run_export_all_job,
+    "export_collection": run_export_collection_job
+}
+
+class JobRunner:
+    """Worker threads that claim queued jobs from MongoDB and store results in GridFS.
+    
+    Threads start lazily in each process, so they survive gunicorn forking.
+    Jobs are claimed atomically, so a job submitted to one worker process may
+    run in another; a job whose runner died is retried after JOB_TIMEOUT_MINUTES.
+    """
+    
+    def __init__(self, workers, poll_seconds):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._last_cleanup = 0
+    
+    def ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid() and all(thread.is_alive() for thread in self._threads):
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def notify(self):
+        self._wakeup.set()
+    
+    def _loop(self):
+        while True:
+            try:
+                job = self._claim()
+                if job is None:
+                    self._cleanup()
+                    self._wakeup.wait(self.poll_seconds)
+                    self._wakeup.clear()
+                    continue
+                self._run(job)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                time.sleep(self.poll_seconds)
+    
+    def _claim(self):
+        now = datetime.now()
+        return jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {
+                    "status": "running",
+                    "started_at": {"$lt": now - timedelta(minutes=JOB_TIMEOUT_MINUTES)},
+                    "attempts": {"$lt": JOB_MAX_ATTEMPTS}
+                }
+            ]},
+            {
+                "$set": {"status": "running", "started_at": now, "worker": f"{socket.gethostname()}:{os.getpid()}"},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    def _run(self, job):
+        user_email = job['user_email']
+        update = {}
+        try:
+            shop = auth_collection.find_one({"email": user_email}) or {}
+            chunks, filename, mimetype = JOB_TYPES[job['type']](user_email, shop, job.get('params', {}))
+            
+            # Results are streamed into GridFS so large exports never sit in memory
+            grid_in = job_results.new_file(filename=filename, content_type=mimetype, job_id=job['_id'])
+            try:
+                for chunk in chunks:
+                    grid_in.write(chunk)
+            except BaseException:
+                # Discard the chunks written so far instead of committing a partial file
+                grid_in.abort()
+                raise
+            grid_in.close()
+            update.update({
+                "status": "done",
+                "result_file_id": grid_in._id,
+                "result_name": filename,
+                "result_mimetype": mimetype,
+                "result_size": grid_in.length
+            })
+        except (ValueError, NotFoundError) as e:
+            update.update({"status": "failed", "error": str(e)})
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['type']}) failed: {e}")
+            update.update({"status": "failed", "error": str(e)})
+        
+        update["finished_at"] = datetime.now()
+        update["expires_at"] = update["finished_at"] + timedelta(hours=JOB_RESULT_HOURS)
+        # Only record the result while this run still owns the job; a run that
+        # overran JOB_TIMEOUT_MINUTES may have been reclaimed by another worker
+        result = jobs_collection.update_one(
+            {"_id": job['_id'], "status": "running", "worker": job['worker'], "attempts": job['attempts']},
+            {"$set": update}
+        )
+        if result.matched_count == 0 and update.get('result_file_id'):
+            job_results.delete(update['result_file_id'])
+    
+    def _cleanup(self):
+        """Fail jobs that ran out of attempts and remove expired jobs and their result files every few minutes"""
+        if time.time() - self._last_cleanup < JOB_CLEANUP_SECONDS:
+            return
+        self._last_cleanup = time.time()
+        now = datetime.now()
+        # Jobs whose last allowed attempt died are never claimed again; fail them so clients stop polling
+        jobs_collection.update_many(
+            {
+                "status": "running",
+                "started_at": {"$lt": now - timedelta(minutes=JOB_TIMEOUT_MINUTES)},
+                "attempts": {"$gte": JOB_MAX_ATTEMPTS}
+            },
+            {"$set": {
+                "status": "failed",
+                "error": f"Job did not finish within {JOB_TIMEOUT_MINUTES} minutes after {JOB_MAX_ATTEMPTS} attempts",
+                "finished_at": now,
+                "expires_at": now + timedelta(hours=JOB_RESULT_HOURS)
+            }}
+        )
+        for job in jobs_collection.find({"expires_at": {"$lt": now}}, {"result_file_id": 1}):
+            if job.get('result_file_id'):
+                job_results.delete(job['result_file_id'])
+            jobs_collection.delete_one({"_id": job['_id']})
+
+job_runner = JobRunner(JOB_WORKERS, JOB_POLL_SECONDS)
+
+def wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true')
+
+def job_params_from_request():
+    """Query parameters worth storing on a job (never the session token)"""
+    return {key: value for key, value in request.args.items() if key not in ('async', 'session_token')}
+
+def submit_job(user_email, job_type, params):
+    now = datetime.now()
+    job = {
+        "user_email": user_email,
+        "type": job_type,
+        "params": params,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=JOB_RESULT_HOURS)
+    }
+    job["_id"] = jobs_collection.insert_one(job).inserted_id
+    job_runner.ensure_started()
+    job_runner.notify()
+    return job
+
+def job_status(job):
+    """Public view of a job document"""
+    status = {
+        "job_id": str(job['_id']),
+        "type": job['type'],
+        "status": job['status'],
+        "params": job.get('params', {}),
+        "created_at": job['created_at'].isoformat(),
+        "started_at": job['started_at'].isoformat() if job.get('started_at') else None,
+        "finished_at": job['finished_at'].isoformat() if job.get('finished_at') else None,
+        "error": job.get('error')
+    }
+    if job['status'] == 'done':
+        status.update({
+            "result_name": job['result_name'],
+            "result_size": job['result_size'],
+            "result_url": f"/api/jobs/{job['_id']}/result"
+        })
+    return status
+
+def queued_job_response(job_type, params):
+    job = submit_job(request.user_email, job_type, params)
+    return jsonify({"success": True, "job": job_status(job)}), 202
+
+def find_user_job(job_id):
+    try:
+        return jobs_collection.find_one({"_id": ObjectId(job_id), "user_email": request.user_email})
+    except Exception:
+        return None
+
+@bp.route('/api/jobs', methods=['POST'])
+@require_auth
+def create_job():
+    """Queue a background job - Requires authentication
+    
+    Body: {"type": "invoice_pdf" | "batch_pdf" | "qr_labels" | "export_all" | "export_collection", "params": {...}}
+    Params match the query parameters of the corresponding synchronous endpoint.
+    """
+    try:
+        data = request.json or {}
+        job_type = data.get('type', '')
+        params = data.get('params') or {}
+        if job_type not in JOB_TYPES:
+            return jsonify({"success": False, "error": f"Unknown job type. Use one of: {', '.join(JOB_TYPES)}"}), 400
+        if not isinstance(params, dict):
+            return jsonify({"success": False, "error": "params must be an object"}), 400
+        return queued_job_response(job_type, params)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+@bp.route('/api/jobs', methods=['GET'])
+@require_auth
+def list_jobs():
+    """List the user's recent jobs - Requires authentication"""
+    try:
+        job_runner.ensure_started()
+        jobs = jobs_collection.find({"user_email": request.user_email}).sort("created_at", -1).limit(50)
+        return jsonify({"success": True, "jobs": [job_status(job) for job in jobs]})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """Poll a job's status - Requires authentication"""
+    try:
+        job_runner.ensure_started()
+        job = find_user_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job not found or access denied"}), 404
+        return jsonify({"success": True, "job": job_status(job)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/api/jobs/<job_id>/result', methods=['GET'])
+@require_auth
+def get_job_result(job_id):
+    """Download a finished job's result - Requires authentication"""
+    try:
+        job = find_user_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job not found or access denied"}), 404
+        if job['status'] != 'done':
+            return jsonify({"success": False, "error": f"Job is {job['status']}", "job": job_status(job)}), 409
+        
+        result = job_results.get(job['result_file_id'])
+        return send_file(result, as_attachment=True, download_name=job['result_name'],
+                         mimetype=job['result_mimetype'])
+    except gridfs.NoFile:
+        return jsonify({"success": False, "error": "Job result has expired"}), 410
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/')
 def index():
     """Serve the main HTML page"""
     return '''
@@ -1600,9 +4817,11 @@ def index():
     </html>
     '''
 
+# WSGI entry point for `gunicorn app:app` and `flask --app app`
+app = create_app()
+
 if __name__ == '__main__':
     print("Starting Flask API server...")
-    print("MongoDB connection established!")
     
     # Get configuration from environment variables
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,138 @@
+# Invoice System - Item search benchmark
+#
+# Seeds a throwaway shop with many items directly in MongoDB, then times the
+# ranked item search against the old unanchored case-insensitive regex for
+# the same typeahead queries, plus the in-memory catalog (ITEM_CATALOG_SHOPS)
+# built from those items, and prints p50/p95/p99 latencies. The seeded
+# items are deleted afterwards unless --keep is given.
+#
+# Usage:
+#   python benchmark_item_search.py --items 100000 --queries 500
+import argparse
+import random
+import statistics
+import time
+
+import app
+
+WORDS = [
+    "milk", "bread", "butter", "cheese", "paneer", "rice", "basmati", "wheat", "flour", "sugar",
+    "salt", "tea", "coffee", "biscuit", "soap", "shampoo", "oil", "mustard", "sunflower", "ghee",
+    "dal", "chana", "moong", "masala", "chilli", "turmeric", "jeera", "pepper", "honey", "jam",
+    "juice", "mango", "apple", "banana", "onion", "potato", "tomato", "garlic", "ginger", "lemon",
+    "detergent", "toothpaste", "brush", "candle", "battery", "bulb", "notebook", "pen", "pencil", "tape"
+]
+SIZES = ["100g", "250g", "500g", "1kg", "5kg", "200ml", "500ml", "1l", "small", "large", "pack of 6"]
+
+
+def random_item_name(rng, serial):
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return f"{' '.join(words).title()} {rng.choice(SIZES)} #{serial}"
+
+
+def seed_items(user_email, count, rng, batch_size=5000):
+    now = app.datetime.now()
+    for start in range(0, count, batch_size):
+        batch = []
+        for serial in range(start, min(start + batch_size, count)):
+            item_name = random_item_name(rng, serial)
+            batch.append({
+                "item_name": item_name,
+                "name_lc": app.normalize_item_name(item_name),
+                "item_price": round(rng.uniform(5, 500), 2),
+                "stock": rng.randint(0, 200),
+                "unit": "pcs",
+                "user_email": user_email,
+                "created_at": now,
+                "updated_at": now
+            })
+        app.items_collection.insert_many(batch, ordered=False)
+
+
+def typeahead_queries(rng, count):
+    """Keystroke-style queries: growing prefixes, whole words and mid-word fragments"""
+    queries = []
+    for _ in range(count):
+        word = rng.choice(WORDS)
+        kind = rng.random()
+        if kind < 0.6:
+            queries.append(word[:rng.randint(1, len(word))])
+        elif kind < 0.85:
+            queries.append(word)
+        else:
+            start = rng.randint(1, max(1, len(word) - 2))
+            queries.append(word[start:start + 3])
+    return queries
+
+
+def legacy_search(user_email, search_term):
+    return list(app.items_collection.find({
+        "item_name": {"$regex": search_term, "$options": "i"},
+        "user_email": user_email
+    }))
+
+
+def time_queries(search, user_email, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search(user_email, query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(f"{label:<8} p50 {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms   "
+          f"p99 {p99:8.2f} ms   max {ordered[-1]:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Item search latency benchmark")
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=app.ITEM_SEARCH_DEFAULT_LIMIT)
+    parser.add_argument('--user-email', default='search-benchmark@example.invalid')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded items')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Benchmark against the declared search indexes (only builds missing ones)
+    app.ensure_indexes()
+    app.items_collection.delete_many({"user_email": args.user_email})
+    started = time.time()
+    seed_items(args.user_email, args.items, rng)
+    print(f"Seeded {args.items} items in {time.time() - started:.1f}s")
+
+    queries = typeahead_queries(rng, args.queries)
+    try:
+        # Warm both paths so the first timed query doesn't pay for cold caches
+        for query in queries[:20]:
+            legacy_search(args.user_email, query)
+            app.search_items_ranked(args.user_email, query, args.limit)
+
+        report("regex", time_queries(legacy_search, args.user_email, queries))
+        report("ranked", time_queries(
+            lambda user_email, query: app.search_items_ranked(user_email, query, args.limit),
+            args.user_email, queries
+        ))
+
+        started = time.time()
+        catalog = app.ShopCatalog(
+            app.serialize_doc(item) for item in app.items_collection.find({"user_email": args.user_email})
+        )
+        print(f"Loaded in-memory catalog in {time.time() - started:.1f}s")
+        report("catalog", time_queries(
+            lambda user_email, query: catalog.search(query, args.limit),
+            args.user_email, queries
+        ))
+    finally:
+        if not args.keep:
+            app.items_collection.delete_many({"user_email": args.user_email})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Invoice System - Worker startup benchmark
+#
+# Measures how long a fresh Python process takes to import the app (what every
+# gunicorn worker pays on boot and on recycle) and lists the slowest imports.
+# Runs without a database: when MONGODB_URI is not set a local placeholder URI
+# is used, which the app must not connect to while importing.
+#
+# Usage:
+#   python benchmark_startup.py --runs 20 --top 15
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault('MONGODB_URI', 'mongodb://127.0.0.1:27017')
+    env.setdefault('EMAILJS_SERVICE_ID', 'benchmark')
+    env.setdefault('EMAILJS_TEMPLATE_ID', 'benchmark')
+    env.setdefault('EMAILJS_PUBLIC_KEY', 'benchmark')
+    return env
+
+
+IMPORT_APP = "import time; started = time.perf_counter(); import app; print((time.perf_counter() - started) * 1000)"
+
+
+def time_startup():
+    """(ms spent importing the app inside the process, ms for the whole process run)"""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', IMPORT_APP], cwd=ROOT, env=child_env(), check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    return float(result.stdout.strip().splitlines()[-1]), wall
+
+
+def slowest_imports(top):
+    """Modules imported directly by app, by cumulative import time (python -X importtime)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=child_env(),
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name.strip() == 'app':
+            break
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+    return sorted(children, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker startup benchmark")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--top', type=int, default=15, help='How many of the slowest imports to list')
+    args = parser.parse_args()
+
+    runs = [time_startup() for _ in range(args.runs)]
+    imports = [import_ms for import_ms, _ in runs]
+    walls = [wall for _, wall in runs]
+    print(f"import app ({args.runs} runs): min {min(imports):.0f} ms, median {statistics.median(imports):.0f} ms, "
+          f"max {max(imports):.0f} ms")
+    print(f"whole process incl. interpreter start and exit: median {statistics.median(walls):.0f} ms")
+
+    print("\nSlowest imports made by app:")
+    for cumulative, name in slowest_imports(args.top):
+        print(f"  {cumulative:8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
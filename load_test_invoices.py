@@ -0,0 +1,111 @@
+# Invoice System - Concurrent checkout load test
+#
+# Fires many simultaneous POST /api/invoices requests against a running server
+# for a single item with limited stock, then checks that stock never went
+# negative, that every successful invoice took exactly its units and that no
+# invoice ID was issued twice (give --stock >= --requests to make every request
+# allocate an ID).
+#
+# Usage:
+#   python load_test_invoices.py --email shop@example.com --password secret \
+#       --base-url http://localhost:5000 --stock 50 --requests 500 --workers 64
+import argparse
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def login(base_url, email, password):
+    """Log in and return the Authorization header"""
+    response = requests.post(f"{base_url}/api/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+
+def create_test_item(base_url, headers, stock):
+    """Create a uniquely named item with the given stock and return its ID"""
+    item_name = f"Load test item {int(time.time() * 1000)}"
+    response = requests.post(f"{base_url}/api/items", headers=headers, json={
+        "item_name": item_name,
+        "item_price": 1,
+        "stock": stock,
+        "unit": "pcs"
+    })
+    response.raise_for_status()
+    return response.json()['item']['_id']
+
+
+def get_stock(base_url, headers, item_id):
+    response = requests.get(f"{base_url}/api/items", headers=headers)
+    response.raise_for_status()
+    for item in response.json()['items']:
+        if item['_id'] == item_id:
+            return item['stock']
+    raise RuntimeError(f"Item {item_id} not found")
+
+
+def checkout(base_url, headers, item_id, quantity):
+    """Create one invoice; returns (status code, invoice ID or None)"""
+    response = requests.post(f"{base_url}/api/invoices", headers=headers, json={
+        "customer_name": "Load Test",
+        "customer_address": "Load Test",
+        "customer_number": "0000000000",
+        "items": [{"item_id": item_id, "quantity": quantity}]
+    })
+    invoice = response.json().get('invoice') if response.ok else None
+    return response.status_code, invoice['invoice_id'] if invoice else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent checkout load test")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--item-id', help='Existing item to sell (a new one is created by default)')
+    parser.add_argument('--stock', type=int, default=50, help='Stock for the created test item')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--quantity', type=int, default=1, help='Units per invoice')
+    args = parser.parse_args()
+
+    headers = login(args.base_url, args.email, args.password)
+    item_id = args.item_id or create_test_item(args.base_url, headers, args.stock)
+    initial_stock = get_stock(args.base_url, headers, item_id)
+    print(f"Item {item_id}: starting stock {initial_stock}")
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(
+            lambda _: checkout(args.base_url, headers, item_id, args.quantity),
+            range(args.requests)
+        ))
+    elapsed = time.time() - started
+
+    final_stock = get_stock(args.base_url, headers, item_id)
+    statuses = Counter(status for status, _ in results)
+    invoice_ids = [invoice_id for _, invoice_id in results if invoice_id is not None]
+    sold = len(invoice_ids) * args.quantity
+
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"Status codes: {dict(statuses)}")
+    print(f"Invoices created: {len(invoice_ids)}, units sold: {sold}, final stock: {final_stock}")
+
+    failures = []
+    if final_stock < 0:
+        failures.append("stock went negative")
+    if initial_stock - sold != final_stock:
+        failures.append(f"stock mismatch: expected {initial_stock - sold}, got {final_stock}")
+    if len(set(invoice_ids)) != len(invoice_ids):
+        failures.append("duplicate invoice IDs were issued")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: no oversell, stock and invoices are consistent")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Shared fixtures: the app wired to a throwaway database.
+
+Tests run against mongomock by default, with each collection operation made
+atomic the way a MongoDB server applies it. Set TEST_MONGODB_URI to run
+them against a real server instead (a replica set exercises the transaction
+path, a standalone server the compensating writes).
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+
+import pytest
+
+TEST_MONGODB_URI = os.getenv('TEST_MONGODB_URI')
+
+# Never let a developer's .env point the tests at a real shop database
+os.environ['MONGODB_URI'] = TEST_MONGODB_URI or 'mongodb://localhost:27017'
+os.environ['MONGODB_DATABASE'] = 'invoice_system_test'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as invoice_app  # noqa: E402
+
+MONGOMOCK_ATOMIC_METHODS = (
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+    'find_one', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
+    'delete_one', 'delete_many', 'bulk_write', 'count_documents', 'distinct', 'aggregate'
+)
+
+def make_mongomock_atomic(monkeypatch, mongomock):
+    """Run each mongomock collection operation under one lock.
+    
+    A server applies every single-document write (and each read) atomically;
+    mongomock does not, so concurrent tests would see races the app cannot have.
+    """
+    lock = threading.RLock()
+    
+    def atomic(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with lock:
+                return method(*args, **kwargs)
+        return wrapper
+    
+    collection_class = mongomock.collection.Collection
+    for name in MONGOMOCK_ATOMIC_METHODS:
+        monkeypatch.setattr(collection_class, name, atomic(getattr(collection_class, name)))
+    # Cursors copy documents lazily; copy them all at once instead
+    get_dataset = collection_class._get_dataset
+    monkeypatch.setattr(collection_class, '_get_dataset', lambda self, *args, **kwargs: iter(
+        atomic(lambda: list(get_dataset(self, *args, **kwargs)))()
+    ))
+
+def reset_connections():
+    """Make every per-process proxy build its client/collection again on next use"""
+    for value in vars(invoice_app).values():
+        if isinstance(value, invoice_app.ProcessLocal):
+            value._pid = None
+    invoice_app._transactions_supported = None
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """The app module with an empty database"""
+    if not TEST_MONGODB_URI:
+        mongomock = pytest.importorskip('mongomock')
+        monkeypatch.setattr(invoice_app, 'MongoClient', mongomock.MongoClient)
+        make_mongomock_atomic(monkeypatch, mongomock)
+    reset_connections()
+    invoice_app.client.drop_database(invoice_app.database_name)
+    invoice_app.ensure_indexes()
+    yield invoice_app
+    invoice_app.client.drop_database(invoice_app.database_name)
+    reset_connections()
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def auth_headers(app_module, client):
+    """Authorization headers for a verified shop account"""
+    app_module.auth_collection.insert_one({
+        "email": "shop@example.com",
+        "password_hash": hashlib.sha256(b"secret").hexdigest(),
+        "email_verified": True,
+        "shop_name": "Test Shop",
+        "shop_address": "1 Main Road",
+        "shop_phone": "9876543210"
+    })
+    response = client.post('/api/auth/login', json={"email": "shop@example.com", "password": "secret"})
+    return {"Authorization": "Bearer " + response.json['session_token']}
@@ -0,0 +1,27 @@
+from io import BytesIO
+
+import pytest
+
+pypdf = pytest.importorskip('pypdf')
+
+def test_combined_batch_pdf_merges_pooled_renders(app_module, client, auth_headers, monkeypatch):
+    # One invoice per chunk so the batch goes through the process pool
+    monkeypatch.setattr(app_module, 'PDF_BATCH_CHUNK_SIZE', 1)
+    item_id = client.post('/api/items', headers=auth_headers, json={
+        "item_name": "Tea", "item_price": 5, "stock": 100
+    }).json['item']['_id']
+    invoice_ids = []
+    for name in ("Asha", "Ravi", "Meena"):
+        response = client.post('/api/invoices', headers=auth_headers, json={
+            "customer_name": name, "customer_address": "Main Road", "customer_number": "9876543210",
+            "items": [{"item_id": item_id, "quantity": 1}]
+        })
+        invoice_ids.append(response.json['invoice']['invoice_id'])
+    
+    response = client.get('/api/invoices/batch-pdf', headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    reader = pypdf.PdfReader(BytesIO(response.data))
+    assert len(reader.pages) == 3
+    assert [f"Invoice ID: {invoice_id}" in page.extract_text() for page, invoice_id in zip(reader.pages, invoice_ids)] == [True] * 3
@@ -0,0 +1,39 @@
+import pytest
+
+@pytest.mark.parametrize("phone, expected", [
+    ("98765 43210", "+919876543210"),
+    ("098765-43210", "+919876543210"),
+    ("+91 98765 43210", "+919876543210"),
+    ("0044 20 7946 0958", "+442079460958"),
+    ("0000000000", ""),
+    ("0", ""),
+    ("+000000", ""),
+    ("123", ""),
+    ("no phone", ""),
+])
+def test_normalize_phone(app_module, phone, expected):
+    assert app_module.normalize_phone(phone) == expected
+
+def test_placeholder_phone_numbers_are_rejected_not_merged(app_module, client, auth_headers):
+    customer = {"customer_name": "Asha", "customer_email": "asha@example.com", "customer_address": "Main Road"}
+    
+    response = client.post('/api/customers', headers=auth_headers, json={**customer, "customer_phone": "0000000000"})
+    assert response.status_code == 400
+    assert response.json['error'] == "Customer phone is not a valid phone number"
+    
+    first = client.post('/api/customers', headers=auth_headers, json={**customer, "customer_phone": "98765 43210"})
+    second = client.post('/api/customers', headers=auth_headers, json={
+        **customer, "customer_name": "Ravi", "customer_phone": "91234 56789"
+    })
+    assert first.json['success'] and second.json['success']
+
+def test_migration_clears_bare_country_code_keys(app_module):
+    app_module.customers_collection.insert_many([
+        {"user_email": "shop@example.com", "customer_phone": "0000000000", "phone_e164": "+91"},
+        {"user_email": "shop@example.com", "customer_phone": "9876543210", "phone_e164": "+919876543210"}
+    ])
+    
+    app_module.migrate_invalid_phone_keys()
+    
+    keys = sorted(customer['phone_e164'] for customer in app_module.customers_collection.find({}))
+    assert keys == ["", "+919876543210"]
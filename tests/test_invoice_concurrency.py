@@ -0,0 +1,55 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Interleavings vary between runs, so each case repeats the burst on a fresh item
+ROUNDS = 5
+
+@pytest.fixture
+def frequent_thread_switches():
+    # Switch threads every few bytecodes so requests interleave inside the stock check/decrement
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+def parallel_checkouts(app_module, auth_headers, item_id, requests):
+    """Post `requests` one-unit invoices for an item at once; returns [(status, invoice_id)]"""
+    start = threading.Barrier(requests)
+    
+    def checkout(_):
+        test_client = app_module.app.test_client()
+        start.wait()
+        response = test_client.post('/api/invoices', headers=auth_headers, json={
+            "customer_name": "Asha", "customer_address": "Main Road", "customer_number": "9876543210",
+            "items": [{"item_id": item_id, "quantity": 1}]
+        })
+        return response.status_code, (response.json.get('invoice') or {}).get('invoice_id')
+    
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        return list(pool.map(checkout, range(requests)))
+
+@pytest.mark.parametrize("stock, requests", [(5, 40), (40, 40)])
+def test_parallel_checkouts_never_oversell_or_reuse_invoice_ids(app_module, client, auth_headers, frequent_thread_switches,
+                                                                stock, requests):
+    all_issued = []
+    for round_number in range(ROUNDS):
+        item_id = client.post('/api/items', headers=auth_headers, json={
+            "item_name": f"Bread {round_number}", "item_price": 30, "stock": stock
+        }).json['item']['_id']
+        
+        results = parallel_checkouts(app_module, auth_headers, item_id, requests)
+        
+        # 400 when the pre-check already sees no stock, 409 when the guarded decrement loses the race
+        assert {status for status, _ in results} <= {200, 400, 409}
+        issued = [invoice_id for status, invoice_id in results if status == 200]
+        assert len(issued) == min(stock, requests)
+        item = app_module.items_collection.find_one({"item_name": f"Bread {round_number}"})
+        assert item['stock'] == stock - len(issued)
+        all_issued.extend(issued)
+    
+    assert len(set(all_issued)) == len(all_issued)
+    stored_ids = [invoice['invoice_id'] for invoice in app_module.invoices_collection.find({})]
+    assert sorted(stored_ids) == sorted(all_issued)
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+import pytest
+
+@pytest.mark.parametrize("stock", [10000, 5000000])
+def test_slow_moving_high_stock_item_has_no_projected_stockout(app_module, client, auth_headers, stock):
+    item_id = client.post('/api/items', headers=auth_headers, json={
+        "item_name": "Rice", "item_price": 50, "stock": stock
+    }).json['item']['_id']
+    app_module.daily_sales_collection.insert_one({
+        "user_email": "shop@example.com",
+        "day": (date.today() - timedelta(days=10)).isoformat(),
+        "items": {item_id: {"name": "Rice", "quantity": 1, "revenue": 50}}
+    })
+    
+    response = client.get('/api/analytics/items?days=366', headers=auth_headers)
+    
+    assert response.status_code == 200
+    [item] = response.json['items']
+    assert item['units_sold'] == 1
+    assert item['days_of_stock'] is None
+    assert item['projected_stockout'] is None
+
+def test_projected_stockout_within_horizon(app_module, client, auth_headers):
+    item_id = client.post('/api/items', headers=auth_headers, json={
+        "item_name": "Milk", "item_price": 30, "stock": 20
+    }).json['item']['_id']
+    app_module.daily_sales_collection.insert_one({
+        "user_email": "shop@example.com",
+        "day": date.today().isoformat(),
+        "items": {item_id: {"name": "Milk", "quantity": 10, "revenue": 300}}
+    })
+    
+    [item] = client.get('/api/analytics/items?days=10', headers=auth_headers).json['items']
+    
+    assert item['days_of_stock'] == 20.0
+    assert item['projected_stockout'] == (date.today() + timedelta(days=20)).isoformat()
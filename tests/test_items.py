@@ -0,0 +1,76 @@
+def test_sold_items_do_not_expose_stock_reservations(app_module, client, auth_headers):
+    item_id = client.post('/api/items', headers=auth_headers, json={
+        "item_name": "Sugar", "item_price": 40, "stock": 10
+    }).json['item']['_id']
+    response = client.post('/api/invoices', headers=auth_headers, json={
+        "customer_name": "Asha", "customer_address": "Main Road", "customer_number": "9876543210",
+        "items": [{"item_id": item_id, "quantity": 2}]
+    })
+    assert response.json['success']
+    
+    [stored] = app_module.items_collection.find({})
+    assert stored['stock'] == 8
+    assert 'stock_reservations' not in stored
+    [listed] = client.get('/api/items', headers=auth_headers).json['items']
+    assert 'stock_reservations' not in listed
+    [found] = client.get('/api/items/search?q=sug', headers=auth_headers).json['items']
+    assert 'stock_reservations' not in found
+
+def test_items_mid_reservation_are_not_exposed(app_module, client, auth_headers):
+    client.post('/api/items', headers=auth_headers, json={"item_name": "Salt", "item_price": 20, "stock": 5})
+    app_module.items_collection.update_many({}, {"$set": {"stock_reservations": ["pending-invoice"]}})
+    
+    [listed] = client.get('/api/items', headers=auth_headers).json['items']
+    exported = client.get('/api/export/items?format=ndjson', headers=auth_headers).get_data(as_text=True)
+    
+    assert 'stock_reservations' not in listed
+    assert '"Salt"' in exported
+    assert 'stock_reservations' not in exported
+
+def test_price_is_only_required_for_new_items(app_module, client, auth_headers):
+    response = client.post('/api/items', headers=auth_headers, json={"item_name": "Oil", "stock": 5})
+    assert response.status_code == 400
+    assert response.json['error'] == "Item price is required"
+    
+    client.post('/api/items', headers=auth_headers, json={"item_name": "Oil", "item_price": 120, "stock": 5})
+    response = client.post('/api/items', headers=auth_headers, json={"item_name": "Oil", "stock": 3})
+    
+    assert response.status_code == 200
+    assert response.json['item']['stock'] == 8
+    assert response.json['item']['item_price'] == 120
+
+def test_import_rows_without_price_only_top_up_existing_items(app_module, client, auth_headers):
+    client.post('/api/items', headers=auth_headers, json={"item_name": "Oil", "item_price": 120, "stock": 5})
+    rows = "\n".join([
+        '{"item_name": "Oil", "stock": 2}',
+        '{"item_name": "Ghee", "stock": 4}',
+        '{"item_name": "Dal", "item_price": 90, "stock": 1}',
+        '{"item_name": "Dal", "stock": 6}'
+    ])
+    
+    report = client.post('/api/import/items?format=ndjson', headers=auth_headers, data=rows).json
+    
+    assert report['failed'] == 1
+    assert report['errors'] == [{"line": 2, "error": "Item price is required"}]
+    stock = {item['item_name']: item['stock'] for item in app_module.items_collection.find({})}
+    assert stock == {"Oil": 7, "Dal": 7}
+
+def test_reorder_crossing_is_stored_as_an_open_alert(app_module, client, auth_headers):
+    item_id = client.post('/api/items', headers=auth_headers, json={
+        "item_name": "Soap", "item_price": 25, "stock": 6, "reorder_level": 5
+    }).json['item']['_id']
+    response = client.post('/api/invoices', headers=auth_headers, json={
+        "customer_name": "Asha", "customer_address": "Main Road", "customer_number": "9876543210",
+        "items": [{"item_id": item_id, "quantity": 2}]
+    })
+    assert [alert['item_id'] for alert in response.json['reorder_alerts']] == [item_id]
+    
+    [alert] = client.get('/api/items/reorder-alerts', headers=auth_headers).json['alerts']
+    assert alert['item_id'] == item_id
+    assert alert['stock'] == 4
+    assert alert['invoice_id'] == response.json['invoice']['invoice_id']
+    
+    acknowledged = client.post(f"/api/items/reorder-alerts/{alert['_id']}/acknowledge", headers=auth_headers)
+    assert acknowledged.status_code == 200
+    assert client.get('/api/items/reorder-alerts', headers=auth_headers).json['alerts'] == []
+    assert len(client.get('/api/items/reorder-alerts?all=1', headers=auth_headers).json['alerts']) == 1
@@ -0,0 +1,10 @@
+from bson import ObjectId
+
+def test_pdf_cache_key_changes_with_layout_version(app_module, monkeypatch):
+    invoice = {"_id": ObjectId(), "invoice_id": 7}
+    shop = {"shop_name": "Test Shop", "shop_address": "1 Main Road", "shop_phone": "9876543210"}
+    key = app_module.pdf_cache_key(invoice, shop)
+    
+    monkeypatch.setattr(app_module, 'PDF_LAYOUT_VERSION', app_module.PDF_LAYOUT_VERSION + 1)
+    
+    assert app_module.pdf_cache_key(invoice, shop) != key
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+def test_stats_without_start_date_only_groups_recent_sales(app_module):
+    now = datetime.now()
+    app_module.invoices_collection.insert_many([
+        {"user_email": "shop@example.com", "invoice_id": 1, "customer_name": "Asha",
+         "order_date": now - timedelta(days=30), "total": 100},
+        {"user_email": "shop@example.com", "invoice_id": 2, "customer_name": "Ravi",
+         "order_date": now, "total": 40}
+    ])
+    
+    stats = app_module.aggregate_stats("shop@example.com", periods=7)
+    
+    assert stats["total_invoices"] == 2
+    assert stats["total_revenue"] == 140
+    assert [period["_id"] for period in stats["sales"]] == [now.strftime("%Y-%m-%d")]
+
+def test_stats_window_without_start_counts_back_from_its_end(app_module):
+    end = datetime(2024, 3, 31)
+    app_module.invoices_collection.insert_many([
+        {"user_email": "shop@example.com", "invoice_id": 1, "customer_name": "Asha",
+         "order_date": datetime(2023, 1, 15), "total": 100},
+        {"user_email": "shop@example.com", "invoice_id": 2, "customer_name": "Ravi",
+         "order_date": datetime(2024, 3, 10), "total": 40}
+    ])
+    
+    stats = app_module.aggregate_stats("shop@example.com", {"$lt": end}, "month", periods=3)
+    
+    assert stats["total_invoices"] == 2
+    assert [period["_id"] for period in stats["sales"]] == ["2024-03"]